@@ -1,5 +1,6 @@
-from pydantic_settings import BaseSettings
-from typing import List
+from pydantic_settings import BaseSettings, SettingsConfigDict
+from functools import cached_property
+from typing import Tuple
 import os
 
 
@@ -20,6 +21,9 @@ class Settings(BaseSettings):
     # Database
     mongodb_uri: str = "mongodb://localhost:27017/cleanairsight"
     database_url: str = ""
+    raw_data_retention_hours: int = 72
+    mongodb_max_pool_size: int = 100
+    mongodb_min_pool_size: int = 10
     
     # Redis
     redis_url: str = "redis://localhost:6379"
@@ -50,15 +54,17 @@ class Settings(BaseSettings):
     discrepancy_threshold: float = 0.30
     low_confidence_threshold: float = 0.60
     
-    class Config:
-        env_file = ".env"
-        case_sensitive = False
+    model_config = SettingsConfigDict(
+        env_file=".env",
+        case_sensitive=False,
+        frozen=True
+    )
     
-    @property
-    def cors_origins_list(self) -> List[str]:
+    @cached_property
+    def cors_origins_list(self) -> Tuple[str, ...]:
         # Use allowed_origins for production, cors_origins for development
         origins = self.allowed_origins if self.environment == "production" else self.cors_origins
-        return [origin.strip() for origin in origins.split(",")]
+        return tuple(origin.strip() for origin in origins.split(","))
 
 
 settings = Settings()
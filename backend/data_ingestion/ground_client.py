@@ -1,12 +1,54 @@
+import asyncio
 import httpx
+import orjson
 import pandas as pd
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional
+from typing import Awaitable, Callable, List, Dict, Optional
 import logging
 from pathlib import Path
 
 logger = logging.getLogger(__name__)
 
+# Parameter name aliases mapped to the standard pollutant names
+_PARAM_MAP = {
+    "pm25": "PM2.5",
+    "pm2.5": "PM2.5",
+    "pm10": "PM10",
+    "o3": "O3",
+    "ozone": "O3",
+    "no2": "NO2",
+    "nitrogen dioxide": "NO2",
+    "co": "CO",
+    "carbon monoxide": "CO",
+    "so2": "SO2",
+    "sulfur dioxide": "SO2"
+}
+
+_MG_UNITS = frozenset({"mg/m³", "mg/m3"})
+
+# Flattened API response fields mapped to the standard record fields
+_OPENAQ_COLUMNS = {
+    "date.utc": "timestamp",
+    "coordinates.latitude": "lat",
+    "coordinates.longitude": "lon",
+    "parameter": "pollutant_type",
+    "value": "value",
+    "city": "city",
+    "location": "location",
+    "unit": "unit"
+}
+
+_AIRNOW_COLUMNS = {
+    "UTC": "timestamp",
+    "Latitude": "lat",
+    "Longitude": "lon",
+    "Parameter": "pollutant_type",
+    "Value": "value",
+    "AQI": "aqi",
+    "Category.Name": "category",
+    "Unit": "unit"
+}
+
 
 class GroundSensorClient:
     """
@@ -19,7 +61,46 @@ class GroundSensorClient:
         self.airnow_api_key = airnow_api_key
         self.openaq_base_url = "https://api.openaq.org/v2"
         self.airnow_base_url = "https://www.airnowapi.org/aq"
+        self._client: Optional[httpx.AsyncClient] = None
+        self._inflight: Dict[tuple, asyncio.Future] = {}
+    
+    async def _get_client(self) -> httpx.AsyncClient:
+        """Lazily create the shared HTTP client (reuses pooled keep-alive connections)"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                http2=True,
+                timeout=httpx.Timeout(30.0, connect=5.0),
+                limits=httpx.Limits(
+                    max_connections=100,
+                    max_keepalive_connections=20,
+                    keepalive_expiry=30.0
+                ),
+                headers={"Accept-Encoding": "gzip, br"}
+            )
+        return self._client
+    
+    async def close(self):
+        """Close the shared HTTP client"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
         
+    async def _dedupe(self, key: tuple, factory: Callable[[], Awaitable]):
+        """Share a single in-flight call between concurrent callers with the same key"""
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(factory())
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # Shield so one caller being cancelled does not cancel the shared call
+        return await asyncio.shield(future)
+    
     async def fetch_openaq_data(
         self, 
         city: Optional[str] = None,
@@ -39,58 +120,74 @@ class GroundSensorClient:
         Returns:
             List of measurement records
         """
+        key = ("openaq", city, country, tuple(bbox or ()), tuple(parameters or ()))
+        records = await self._dedupe(
+            key, lambda: self._fetch_openaq_data(city, country, bbox, parameters)
+        )
+        # Copy so callers sharing a result do not see each other's mutations
+        return [dict(record) for record in records]
+    
+    async def _fetch_openaq_data(
+        self,
+        city: Optional[str],
+        country: str,
+        bbox: Optional[tuple],
+        parameters: Optional[List[str]]
+    ) -> List[Dict]:
+        """Request and transform OpenAQ measurements"""
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                params = {
-                    "limit": 1000,
-                    "order_by": "datetime",
-                    "sort": "desc"
-                }
-                
-                if city:
-                    params["city"] = city
-                if country:
-                    params["country"] = country
-                if bbox:
-                    min_lon, min_lat, max_lon, max_lat = bbox
-                    params["coordinates"] = f"{min_lat},{min_lon},{max_lat},{max_lon}"
-                if parameters:
-                    params["parameter"] = ",".join(parameters)
-                
-                headers = {}
-                if self.openaq_api_key:
-                    headers["X-API-Key"] = self.openaq_api_key
-                
-                logger.info(f"Fetching OpenAQ data for {city or 'all locations'}")
-                
-                response = await client.get(
-                    f"{self.openaq_base_url}/measurements",
-                    params=params,
-                    headers=headers
-                )
-                response.raise_for_status()
-                
-                data = response.json()
-                measurements = data.get("results", [])
-                
-                # Transform to standard format
-                records = []
-                for m in measurements:
-                    records.append({
-                        "timestamp": m.get("date", {}).get("utc"),
-                        "lat": m.get("coordinates", {}).get("latitude"),
-                        "lon": m.get("coordinates", {}).get("longitude"),
-                        "pollutant_type": self._normalize_parameter(m.get("parameter")),
-                        "value": self._convert_to_ugm3(m.get("value"), m.get("unit")),
-                        "source": "OpenAQ",
-                        "city": m.get("city"),
-                        "location": m.get("location"),
-                        "unit": "µg/m³"
-                    })
-                
-                logger.info(f"Fetched {len(records)} OpenAQ records")
-                return records
-                
+            client = await self._get_client()
+            
+            params = {
+                "limit": 1000,
+                "order_by": "datetime",
+                "sort": "desc"
+            }
+            
+            if city:
+                params["city"] = city
+            if country:
+                params["country"] = country
+            if bbox:
+                min_lon, min_lat, max_lon, max_lat = bbox
+                params["coordinates"] = f"{min_lat},{min_lon},{max_lat},{max_lon}"
+            if parameters:
+                params["parameter"] = ",".join(parameters)
+            
+            headers = {}
+            if self.openaq_api_key:
+                headers["X-API-Key"] = self.openaq_api_key
+            
+            logger.info(f"Fetching OpenAQ data for {city or 'all locations'}")
+            
+            response = await client.get(
+                f"{self.openaq_base_url}/measurements",
+                params=params,
+                headers=headers
+            )
+            response.raise_for_status()
+            
+            data = orjson.loads(response.content)
+            measurements = data.get("results", [])
+            
+            # Transform to standard format (columnar)
+            df = self._flatten(measurements, _OPENAQ_COLUMNS)
+            df["pollutant_type"] = self._normalize_parameters(df["pollutant_type"])
+            # mg/m³ -> µg/m³ is x1000; ppm is also scaled by 1000 as a rough
+            # approximation (the true factor depends on molecular weight)
+            needs_scaling = df["unit"].isin(_MG_UNITS | {"ppm"})
+            df["value"] = df["value"].where(~needs_scaling, df["value"] * 1000)
+            df["source"] = "OpenAQ"
+            df["unit"] = "µg/m³"
+            
+            records = self._to_records(df[[
+                "timestamp", "lat", "lon", "pollutant_type", "value",
+                "source", "city", "location", "unit"
+            ]])
+            
+            logger.info(f"Fetched {len(records)} OpenAQ records")
+            return records
+            
         except Exception as e:
             logger.error(f"Error fetching OpenAQ data: {e}")
             return []
@@ -114,52 +211,59 @@ class GroundSensorClient:
             logger.warning("AirNow API key not provided, skipping AirNow data")
             return []
         
+        key = ("airnow", tuple(bbox or ()), tuple(parameters or ()))
+        records = await self._dedupe(key, lambda: self._fetch_airnow_data(bbox, parameters))
+        return [dict(record) for record in records]
+    
+    async def _fetch_airnow_data(
+        self,
+        bbox: Optional[tuple],
+        parameters: Optional[List[str]]
+    ) -> List[Dict]:
+        """Request and transform AirNow observations"""
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                if bbox:
-                    min_lon, min_lat, max_lon, max_lat = bbox
-                else:
-                    # Default to continental US
-                    min_lon, min_lat, max_lon, max_lat = -125, 25, -65, 50
-                
-                params = {
-                    "bbox": f"{min_lon},{min_lat},{max_lon},{max_lat}",
-                    "format": "application/json",
-                    "API_KEY": self.airnow_api_key,
-                    "verbose": 1
-                }
-                
-                if parameters:
-                    params["parameters"] = ",".join(parameters)
-                
-                logger.info(f"Fetching AirNow data for bbox {bbox}")
-                
-                response = await client.get(
-                    f"{self.airnow_base_url}/data/",
-                    params=params
-                )
-                response.raise_for_status()
-                
-                data = response.json()
-                
-                # Transform to standard format
-                records = []
-                for item in data:
-                    records.append({
-                        "timestamp": item.get("UTC"),
-                        "lat": item.get("Latitude"),
-                        "lon": item.get("Longitude"),
-                        "pollutant_type": self._normalize_parameter(item.get("Parameter")),
-                        "value": float(item.get("Value", 0)),
-                        "source": "AirNow",
-                        "aqi": item.get("AQI"),
-                        "category": item.get("Category", {}).get("Name"),
-                        "unit": item.get("Unit")
-                    })
-                
-                logger.info(f"Fetched {len(records)} AirNow records")
-                return records
-                
+            client = await self._get_client()
+            
+            if bbox:
+                min_lon, min_lat, max_lon, max_lat = bbox
+            else:
+                # Default to continental US
+                min_lon, min_lat, max_lon, max_lat = -125, 25, -65, 50
+            
+            params = {
+                "bbox": f"{min_lon},{min_lat},{max_lon},{max_lat}",
+                "format": "application/json",
+                "API_KEY": self.airnow_api_key
+                # verbose=1 only adds site/agency metadata that is not used
+            }
+            
+            if parameters:
+                params["parameters"] = ",".join(parameters)
+            
+            logger.info(f"Fetching AirNow data for bbox {bbox}")
+            
+            response = await client.get(
+                f"{self.airnow_base_url}/data/",
+                params=params
+            )
+            response.raise_for_status()
+            
+            data = orjson.loads(response.content)
+            
+            # Transform to standard format (columnar)
+            df = self._flatten(data, _AIRNOW_COLUMNS)
+            df["pollutant_type"] = self._normalize_parameters(df["pollutant_type"])
+            df["value"] = pd.to_numeric(df["value"]).fillna(0).astype(float)
+            df["source"] = "AirNow"
+            
+            records = self._to_records(df[[
+                "timestamp", "lat", "lon", "pollutant_type", "value",
+                "source", "aqi", "category", "unit"
+            ]])
+            
+            logger.info(f"Fetched {len(records)} AirNow records")
+            return records
+            
         except Exception as e:
             logger.error(f"Error fetching AirNow data: {e}")
             return []
@@ -170,54 +274,65 @@ class GroundSensorClient:
         bbox: Optional[tuple] = None
     ) -> List[Dict]:
         """Fetch data from all ground sensor sources"""
-        openaq_data = await self.fetch_openaq_data(city=city, bbox=bbox)
-        airnow_data = await self.fetch_airnow_data(bbox=bbox)
+        # Sources are independent, so query them concurrently
+        openaq_data, airnow_data = await asyncio.gather(
+            self.fetch_openaq_data(city=city, bbox=bbox),
+            self.fetch_airnow_data(bbox=bbox),
+            return_exceptions=True
+        )
+        
+        if isinstance(openaq_data, Exception):
+            logger.error(f"Error fetching OpenAQ data: {openaq_data}")
+            openaq_data = []
+        if isinstance(airnow_data, Exception):
+            logger.error(f"Error fetching AirNow data: {airnow_data}")
+            airnow_data = []
         
         all_data = openaq_data + airnow_data
         logger.info(f"Total ground sensor records: {len(all_data)}")
         
         return all_data
     
-    def _normalize_parameter(self, param: str) -> str:
-        """Normalize parameter names to standard format"""
-        param_mapping = {
-            "pm25": "PM2.5",
-            "pm2.5": "PM2.5",
-            "pm10": "PM10",
-            "o3": "O3",
-            "ozone": "O3",
-            "no2": "NO2",
-            "nitrogen dioxide": "NO2",
-            "co": "CO",
-            "carbon monoxide": "CO",
-            "so2": "SO2",
-            "sulfur dioxide": "SO2"
-        }
-        return param_mapping.get(param.lower(), param.upper())
+    def _flatten(self, items: List[Dict], columns: Dict[str, str]) -> pd.DataFrame:
+        """Flatten API response items into a DataFrame with standard column names"""
+        df = pd.json_normalize(items)
+        return df.reindex(columns=list(columns)).rename(columns=columns)
     
-    def _convert_to_ugm3(self, value: float, unit: str) -> float:
-        """Convert values to µg/m³"""
-        if unit in ["µg/m³", "ug/m3", "ugm3"]:
-            return value
-        elif unit in ["mg/m³", "mg/m3"]:
-            return value * 1000
-        elif unit == "ppm":
-            # Approximate conversion (depends on molecular weight and conditions)
-            return value * 1000  # Simplified
-        return value
+    def _to_records(self, df: pd.DataFrame) -> List[Dict]:
+        """Convert a DataFrame to records, mapping missing values to None"""
+        return df.astype(object).where(df.notna(), None).to_dict("records")
     
-    async def save_raw_data(self, data: List[Dict], output_dir: str = "data/raw"):
-        """Save raw ground sensor data to CSV"""
+    def _normalize_parameters(self, params: pd.Series) -> pd.Series:
+        """Map parameter names to standard pollutant names; unknown names are upper-cased"""
+        params = params.fillna("").astype(str)
+        return params.str.casefold().map(_PARAM_MAP).fillna(params.str.upper())
+    
+    async def save_raw_data(
+        self,
+        data: List[Dict],
+        output_dir: str = "data/raw",
+        file_format: str = "parquet"
+    ):
+        """Save raw ground sensor data to Parquet (zstd compressed) or CSV"""
         if not data:
             return
         
-        Path(output_dir).mkdir(parents=True, exist_ok=True)
+        await asyncio.to_thread(Path(output_dir).mkdir, parents=True, exist_ok=True)
         
         df = pd.DataFrame(data)
         timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-        filename = f"{output_dir}/ground_{timestamp}.csv"
+        filename = f"{output_dir}/ground_{timestamp}.{file_format}"
+        
+        if file_format == "csv":
+            await asyncio.to_thread(df.to_csv, filename, index=False)
+        else:
+            # Store timestamps as native Arrow timestamps rather than strings
+            if "timestamp" in df.columns:
+                df["timestamp"] = pd.to_datetime(df["timestamp"], utc=True, errors="coerce")
+            await asyncio.to_thread(
+                df.to_parquet, filename, index=False, compression="zstd", engine="pyarrow"
+            )
         
-        df.to_csv(filename, index=False)
         logger.info(f"Saved ground data to {filename}")
         
         return filename
@@ -226,14 +341,13 @@ class GroundSensorClient:
 # Example usage for testing
 async def test_ground_client():
     """Test the ground sensor client"""
-    client = GroundSensorClient()
-    data = await client.fetch_all_ground_data(city="Los Angeles")
-    print(f"Fetched {len(data)} ground sensor records")
-    
-    if data:
-        await client.save_raw_data(data)
+    async with GroundSensorClient() as client:
+        data = await client.fetch_all_ground_data(city="Los Angeles")
+        print(f"Fetched {len(data)} ground sensor records")
+        
+        if data:
+            await client.save_raw_data(data)
 
 
 if __name__ == "__main__":
-    import asyncio
     asyncio.run(test_ground_client())
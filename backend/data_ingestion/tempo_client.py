@@ -1,9 +1,10 @@
+import asyncio
 import httpx
 import xarray as xr
 import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Union
 import logging
 from pathlib import Path
 import aiofiles
@@ -19,6 +20,13 @@ class TEMPOClient:
     TEMPO provides hourly measurements of NO2, O3, and HCHO across North America.
     """
     
+    # Concentration ranges (µg/m³) used for simulated data
+    SIMULATED_RANGES = {
+        "NO2": (5, 50),
+        "O3": (20, 80),
+        "HCHO": (1, 15)
+    }
+    
     def __init__(self, username: str, password: str):
         self.username = username
         self.password = password
@@ -30,13 +38,42 @@ class TEMPOClient:
             "O3": "/TEMPO_O3_L2/",
             "HCHO": "/TEMPO_HCHO_L2/"
         }
+        self._client: Optional[httpx.AsyncClient] = None
+        self._rng = np.random.default_rng()
+    
+    async def _get_client(self) -> httpx.AsyncClient:
+        """Lazily create the shared HTTP client (reuses pooled keep-alive connections)"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                http2=True,
+                timeout=httpx.Timeout(30.0, connect=5.0),
+                limits=httpx.Limits(
+                    max_connections=100,
+                    max_keepalive_connections=20,
+                    keepalive_expiry=30.0
+                ),
+                headers={"Accept-Encoding": "gzip, br"}
+            )
+        return self._client
+    
+    async def close(self):
+        """Close the shared HTTP client"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
     
     async def fetch_tempo_data(
         self, 
         pollutant: str = "NO2", 
         date: Optional[datetime] = None,
         bbox: Optional[tuple] = None
-    ) -> List[Dict]:
+    ) -> pd.DataFrame:
         """
         Fetch TEMPO satellite data for a specific pollutant.
         
@@ -46,23 +83,16 @@ class TEMPOClient:
             bbox: Bounding box (min_lon, min_lat, max_lon, max_lat)
         
         Returns:
-            List of data records
+            DataFrame of data records (one row per grid point)
         """
         if date is None:
             date = datetime.utcnow()
         
         if pollutant not in self.products:
             logger.error(f"Invalid pollutant type: {pollutant}")
-            return []
+            return pd.DataFrame()
         
         try:
-            # Construct file path (adjust based on actual TEMPO file naming convention)
-            year = date.strftime("%Y")
-            doy = date.strftime("%j")
-            
-            # Example file pattern - adjust based on actual TEMPO data structure
-            file_pattern = f"TEMPO_{pollutant}_L2_{date.strftime('%Y%m%d')}"
-            
             logger.info(f"Fetching TEMPO {pollutant} data for {date.strftime('%Y-%m-%d')}")
             
             # For demonstration, we'll simulate data fetching
@@ -73,14 +103,31 @@ class TEMPOClient:
             
         except Exception as e:
             logger.error(f"Error fetching TEMPO data: {e}")
-            return []
+            return pd.DataFrame()
+    
+    async def fetch_all_tempo(
+        self,
+        date: Optional[datetime] = None,
+        bbox: Optional[tuple] = None
+    ) -> Dict[str, pd.DataFrame]:
+        """
+        Fetch TEMPO data for all supported pollutants concurrently.
+        
+        Returns:
+            Dict mapping pollutant type to its DataFrame of records
+        """
+        pollutants = list(self.products)
+        results = await asyncio.gather(
+            *(self.fetch_tempo_data(pollutant, date, bbox) for pollutant in pollutants)
+        )
+        return dict(zip(pollutants, results))
     
     async def _fetch_and_parse_tempo_file(
         self, 
         pollutant: str, 
         date: datetime,
         bbox: Optional[tuple] = None
-    ) -> List[Dict]:
+    ) -> pd.DataFrame:
         """
         Download and parse TEMPO NetCDF/HDF5 file.
         
@@ -104,60 +151,62 @@ class TEMPOClient:
             lats = np.arange(min_lat, max_lat, 0.1)
             lons = np.arange(min_lon, max_lon, 0.1)
             
-            data_records = []
-            
             # Sample a subset of grid points for demonstration
-            sample_indices = np.random.choice(len(lats) * len(lons), min(1000, len(lats) * len(lons)), replace=False)
+            n_points = len(lats) * len(lons)
+            sample_indices = self._rng.choice(n_points, min(1000, n_points), replace=False)
+            lat_idx, lon_idx = np.divmod(sample_indices, len(lons))
             
-            for idx in sample_indices:
-                lat_idx = idx // len(lons)
-                lon_idx = idx % len(lons)
-                
-                lat = lats[lat_idx]
-                lon = lons[lon_idx]
-                
-                # Simulate pollutant concentration (in µg/m³)
-                # Real values would come from TEMPO data
-                if pollutant == "NO2":
-                    value = np.random.uniform(5, 50)
-                elif pollutant == "O3":
-                    value = np.random.uniform(20, 80)
-                elif pollutant == "HCHO":
-                    value = np.random.uniform(1, 15)
-                else:
-                    value = 0
-                
-                data_records.append({
-                    "timestamp": date.isoformat(),
-                    "lat": float(lat),
-                    "lon": float(lon),
-                    "pollutant_type": pollutant,
-                    "value": float(value),
-                    "source": "TEMPO",
-                    "quality_flag": "good",
-                    "uncertainty": float(value * 0.1)
-                })
+            # Simulate pollutant concentration (in µg/m³)
+            # Real values would come from TEMPO data
+            low, high = self.SIMULATED_RANGES.get(pollutant, (0, 0))
+            values = self._rng.uniform(low, high, size=len(sample_indices)).astype(np.float32)
             
-            logger.info(f"Parsed {len(data_records)} TEMPO {pollutant} records")
-            return data_records
+            n = len(values)
+            df = pd.DataFrame({
+                "timestamp": self._constant_column(date.isoformat(), n),
+                "lat": lats[lat_idx],
+                "lon": lons[lon_idx],
+                "pollutant_type": self._constant_column(pollutant, n),
+                "value": values,
+                "source": self._constant_column("TEMPO", n),
+                "quality_flag": self._constant_column("good", n),
+                "uncertainty": values * np.float32(0.1)
+            })
+            
+            logger.info(f"Parsed {len(df)} TEMPO {pollutant} records")
+            return df
             
         except Exception as e:
             logger.error(f"Error parsing TEMPO file: {e}")
-            return []
+            return pd.DataFrame()
     
-    async def save_raw_data(self, data: List[Dict], output_dir: str = "data/raw"):
-        """Save raw TEMPO data to CSV"""
-        if not data:
+    async def save_raw_data(
+        self,
+        data: Union[pd.DataFrame, List[Dict]],
+        output_dir: str = "data/raw",
+        file_format: str = "parquet"
+    ):
+        """Save raw TEMPO data to Parquet (zstd compressed) or CSV"""
+        df = data.copy() if isinstance(data, pd.DataFrame) else pd.DataFrame(data)
+        if df.empty:
             return
         
-        Path(output_dir).mkdir(parents=True, exist_ok=True)
+        await asyncio.to_thread(Path(output_dir).mkdir, parents=True, exist_ok=True)
         
-        df = pd.DataFrame(data)
         timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-        pollutant = data[0].get("pollutant_type", "unknown")
-        filename = f"{output_dir}/tempo_{pollutant}_{timestamp}.csv"
+        pollutant = df["pollutant_type"].iloc[0] if "pollutant_type" in df.columns else "unknown"
+        filename = f"{output_dir}/tempo_{pollutant}_{timestamp}.{file_format}"
+        
+        if file_format == "csv":
+            await asyncio.to_thread(df.to_csv, filename, index=False)
+        else:
+            # Store timestamps as native Arrow timestamps rather than strings
+            if "timestamp" in df.columns:
+                df["timestamp"] = pd.to_datetime(df["timestamp"], utc=True, errors="coerce")
+            await asyncio.to_thread(
+                df.to_parquet, filename, index=False, compression="zstd", engine="pyarrow"
+            )
         
-        df.to_csv(filename, index=False)
         logger.info(f"Saved TEMPO data to {filename}")
         
         return filename
@@ -166,14 +215,13 @@ class TEMPOClient:
 # Example usage for testing
 async def test_tempo_client():
     """Test the TEMPO client"""
-    client = TEMPOClient("username", "password")
-    data = await client.fetch_tempo_data("NO2")
-    print(f"Fetched {len(data)} TEMPO records")
-    
-    if data:
-        await client.save_raw_data(data)
+    async with TEMPOClient("username", "password") as client:
+        data = await client.fetch_tempo_data("NO2")
+        print(f"Fetched {len(data)} TEMPO records")
+        
+        if not data.empty:
+            await client.save_raw_data(data)
 
 
 if __name__ == "__main__":
-    import asyncio
     asyncio.run(test_tempo_client())
@@ -1,7 +1,12 @@
+import asyncio
 import httpx
+import orjson
+import numpy as np
 import pandas as pd
+from aiolimiter import AsyncLimiter
+from cachetools import TTLCache
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional
+from typing import Awaitable, Callable, List, Dict, Optional
 import logging
 from pathlib import Path
 
@@ -14,10 +19,91 @@ class WeatherClient:
     Provides temperature, humidity, wind, pressure data.
     """
     
-    def __init__(self, api_key: str):
+    # OpenWeatherMap free tier: 60 calls/min
+    RATE_LIMIT_PER_MINUTE = 60
+    
+    # Maximum number of city IDs accepted by the group endpoint
+    GROUP_MAX_IDS = 20
+    
+    # Current conditions update roughly every 10 minutes upstream
+    CURRENT_WEATHER_TTL_SECONDS = 600
+    
+    def __init__(self, api_key: str, max_concurrency: int = 60):
         self.api_key = api_key
         self.base_url = "https://api.openweathermap.org/data/2.5"
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._rate_limiter = AsyncLimiter(self.RATE_LIMIT_PER_MINUTE, 60)
+        self._inflight: Dict[tuple, asyncio.Future] = {}
+        self._current_cache = TTLCache(maxsize=4096, ttl=self.CURRENT_WEATHER_TTL_SECONDS)
+    
+    async def _get_client(self) -> httpx.AsyncClient:
+        """Lazily create the shared HTTP client (reuses pooled keep-alive connections)"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                http2=True,
+                timeout=httpx.Timeout(30.0, connect=5.0),
+                limits=httpx.Limits(
+                    max_connections=100,
+                    max_keepalive_connections=20,
+                    keepalive_expiry=30.0
+                ),
+                headers={"Accept-Encoding": "gzip, br"}
+            )
+        return self._client
+    
+    async def close(self):
+        """Close the shared HTTP client"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+    
+    async def _get(self, endpoint: str, params: Dict) -> httpx.Response:
+        """Issue a GET request bounded by the concurrency limit and API rate limit"""
+        client = await self._get_client()
         
+        async with self._semaphore:
+            async with self._rate_limiter:
+                response = await client.get(f"{self.base_url}/{endpoint}", params=params)
+        
+        response.raise_for_status()
+        return response
+    
+    async def _dedupe(self, key: tuple, factory: Callable[[], Awaitable]):
+        """Share a single in-flight call between concurrent callers with the same key"""
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(factory())
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # Shield so one caller being cancelled does not cancel the shared call
+        return await asyncio.shield(future)
+    
+    def _parse_current_weather(self, data: Dict, lat: float, lon: float) -> Dict:
+        """Transform an OpenWeatherMap current-weather payload to a weather record"""
+        return {
+            "timestamp": datetime.utcfromtimestamp(data.get("dt")).isoformat(),
+            "lat": lat,
+            "lon": lon,
+            "temperature": data.get("main", {}).get("temp"),
+            "feels_like": data.get("main", {}).get("feels_like"),
+            "humidity": data.get("main", {}).get("humidity"),
+            "pressure": data.get("main", {}).get("pressure"),
+            "wind_speed": data.get("wind", {}).get("speed"),
+            "wind_direction": data.get("wind", {}).get("deg"),
+            "clouds": data.get("clouds", {}).get("all"),
+            "visibility": data.get("visibility"),
+            "weather_condition": data.get("weather", [{}])[0].get("main"),
+            "weather_description": data.get("weather", [{}])[0].get("description"),
+            "source": "OpenWeatherMap"
+        }
+    
     async def fetch_current_weather(
         self,
         lat: float,
@@ -33,44 +119,91 @@ class WeatherClient:
         Returns:
             Weather data dictionary
         """
+        # Cache by ~1km cell; return copies since callers annotate records
+        cache_key = (round(lat, 2), round(lon, 2))
+        record = self._current_cache.get(cache_key)
+        if record is None:
+            # Concurrent misses for the same cell share one request
+            record = await self._dedupe(
+                ("current",) + cache_key,
+                lambda: self._request_current_weather(lat, lon, cache_key)
+            )
+        
+        return {**record, "lat": lat, "lon": lon} if record else {}
+    
+    async def _request_current_weather(self, lat: float, lon: float, cache_key: tuple) -> Dict:
+        """Request current weather and store the parsed record in the TTL cache"""
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                params = {
-                    "lat": lat,
-                    "lon": lon,
-                    "appid": self.api_key,
-                    "units": "metric"
-                }
-                
-                response = await client.get(
-                    f"{self.base_url}/weather",
-                    params=params
-                )
-                response.raise_for_status()
-                
-                data = response.json()
-                
-                return {
-                    "timestamp": datetime.utcfromtimestamp(data.get("dt")).isoformat(),
-                    "lat": lat,
-                    "lon": lon,
-                    "temperature": data.get("main", {}).get("temp"),
-                    "feels_like": data.get("main", {}).get("feels_like"),
-                    "humidity": data.get("main", {}).get("humidity"),
-                    "pressure": data.get("main", {}).get("pressure"),
-                    "wind_speed": data.get("wind", {}).get("speed"),
-                    "wind_direction": data.get("wind", {}).get("deg"),
-                    "clouds": data.get("clouds", {}).get("all"),
-                    "visibility": data.get("visibility"),
-                    "weather_condition": data.get("weather", [{}])[0].get("main"),
-                    "weather_description": data.get("weather", [{}])[0].get("description"),
-                    "source": "OpenWeatherMap"
-                }
-                
+            params = {
+                "lat": lat,
+                "lon": lon,
+                "appid": self.api_key,
+                "units": "metric"
+            }
+            
+            response = await self._get("weather", params)
+            
+            data = orjson.loads(response.content)
+            
+            record = self._parse_current_weather(data, lat, lon)
+            
+            self._current_cache[cache_key] = record
+            return record
+            
         except Exception as e:
             logger.error(f"Error fetching weather data: {e}")
             return {}
     
+    async def fetch_current_weather_bulk(self, city_ids: List[int]) -> List[Dict]:
+        """
+        Fetch current weather for many cities using the group endpoint.
+        
+        The group endpoint accepts up to 20 city IDs per call, so this needs
+        roughly 20x fewer requests than per-point lookups.
+        
+        Args:
+            city_ids: OpenWeatherMap city IDs
+        
+        Returns:
+            List of weather records (with 'city' and 'city_id' set)
+        """
+        async def fetch_group(ids: List[int]) -> List[Dict]:
+            params = {
+                "id": ",".join(str(city_id) for city_id in ids),
+                "appid": self.api_key,
+                "units": "metric"
+            }
+            response = await self._get("group", params)
+            data = orjson.loads(response.content)
+            
+            records = []
+            for item in data.get("list", []):
+                coord = item.get("coord", {})
+                record = self._parse_current_weather(item, coord.get("lat"), coord.get("lon"))
+                record["city"] = item.get("name", "Unknown")
+                record["city_id"] = item.get("id")
+                records.append(record)
+            return records
+        
+        chunks = [
+            city_ids[i:i + self.GROUP_MAX_IDS]
+            for i in range(0, len(city_ids), self.GROUP_MAX_IDS)
+        ]
+        results = await asyncio.gather(
+            *(fetch_group(chunk) for chunk in chunks),
+            return_exceptions=True
+        )
+        
+        records = []
+        for result in results:
+            if isinstance(result, Exception):
+                logger.error(f"Error fetching bulk weather data: {result}")
+            else:
+                records.extend(result)
+        
+        logger.info(f"Fetched bulk weather data for {len(records)} cities")
+        return records
+    
     async def fetch_weather_for_cities(
         self,
         cities: List[Dict[str, float]]
@@ -79,22 +212,36 @@ class WeatherClient:
         Fetch weather data for multiple cities.
         
         Args:
-            cities: List of dicts with 'lat' and 'lon' keys
+            cities: List of dicts with 'lat' and 'lon' keys, and optionally an
+                OpenWeatherMap city 'id' to use the bulk group endpoint
         
         Returns:
             List of weather records
         """
-        records = []
+        async def fetch_city(city: Dict) -> Dict:
+            weather_data = await self.fetch_current_weather(city["lat"], city["lon"])
+            if weather_data:
+                weather_data["city"] = city.get("name", "Unknown")
+            return weather_data
         
-        for city in cities:
-            lat = city.get("lat")
-            lon = city.get("lon")
-            
-            if lat and lon:
-                weather_data = await self.fetch_current_weather(lat, lon)
-                if weather_data:
-                    weather_data["city"] = city.get("name", "Unknown")
-                    records.append(weather_data)
+        bulk_cities = [city for city in cities if city.get("id")]
+        point_cities = [
+            city for city in cities
+            if not city.get("id") and city.get("lat") and city.get("lon")
+        ]
+        
+        results = await asyncio.gather(
+            *(fetch_city(city) for city in point_cities),
+            return_exceptions=True
+        )
+        records = [r for r in results if r and not isinstance(r, Exception)]
+        
+        if bulk_cities:
+            names = {city["id"]: city.get("name") for city in bulk_cities}
+            bulk_records = await self.fetch_current_weather_bulk(list(names))
+            for record in bulk_records:
+                record["city"] = names.get(record["city_id"]) or record["city"]
+            records.extend(bulk_records)
         
         logger.info(f"Fetched weather data for {len(records)} locations")
         return records
@@ -116,33 +263,20 @@ class WeatherClient:
         """
         min_lon, min_lat, max_lon, max_lat = bbox
         
-        lats = []
-        lons = []
+        # Small epsilon keeps the max edge inclusive despite float rounding
+        eps = grid_resolution * 1e-6
+        lat_axis = np.arange(min_lat, max_lat + eps, grid_resolution)
+        lon_axis = np.arange(min_lon, max_lon + eps, grid_resolution)
+        lat_grid, lon_grid = np.meshgrid(lat_axis, lon_axis, indexing="ij")
+        lats = lat_grid.ravel().tolist()
+        lons = lon_grid.ravel().tolist()
         
-        lat = min_lat
-        while lat <= max_lat:
-            lon = min_lon
-            while lon <= max_lon:
-                lats.append(lat)
-                lons.append(lon)
-                lon += grid_resolution
-            lat += grid_resolution
-        
-        records = []
-        
-        # Batch requests to avoid rate limiting
-        for i in range(0, len(lats), 60):  # OpenWeatherMap free tier: 60 calls/min
-            batch_lats = lats[i:i+60]
-            batch_lons = lons[i:i+60]
-            
-            for lat, lon in zip(batch_lats, batch_lons):
-                weather_data = await self.fetch_current_weather(lat, lon)
-                if weather_data:
-                    records.append(weather_data)
-            
-            # Small delay to respect rate limits
-            if i + 60 < len(lats):
-                await asyncio.sleep(1)
+        # Requests run concurrently; the rate limiter paces them to the API quota
+        results = await asyncio.gather(
+            *(self.fetch_current_weather(lat, lon) for lat, lon in zip(lats, lons)),
+            return_exceptions=True
+        )
+        records = [r for r in results if r and not isinstance(r, Exception)]
         
         logger.info(f"Fetched weather data for {len(records)} grid points")
         return records
@@ -165,89 +299,101 @@ class WeatherClient:
             List of forecast records
         """
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                params = {
+            params = {
+                "lat": lat,
+                "lon": lon,
+                "appid": self.api_key,
+                "units": "metric",
+                "cnt": min(hours // 3, 40)  # 3-hour intervals, max 40 (5 days)
+            }
+            
+            response = await self._get("forecast", params)
+            
+            data = orjson.loads(response.content)
+            
+            items = data.get("list", [])
+            
+            # Convert all epoch timestamps in one pass
+            timestamps = pd.to_datetime(
+                [item.get("dt") for item in items], unit="s"
+            ).strftime("%Y-%m-%dT%H:%M:%S")
+            
+            records = []
+            for item, timestamp in zip(items, timestamps):
+                records.append({
+                    "timestamp": timestamp,
                     "lat": lat,
                     "lon": lon,
-                    "appid": self.api_key,
-                    "units": "metric",
-                    "cnt": min(hours // 3, 40)  # 3-hour intervals, max 40 (5 days)
-                }
-                
-                response = await client.get(
-                    f"{self.base_url}/forecast",
-                    params=params
-                )
-                response.raise_for_status()
-                
-                data = response.json()
-                
-                records = []
-                for item in data.get("list", []):
-                    records.append({
-                        "timestamp": datetime.utcfromtimestamp(item.get("dt")).isoformat(),
-                        "lat": lat,
-                        "lon": lon,
-                        "temperature": item.get("main", {}).get("temp"),
-                        "humidity": item.get("main", {}).get("humidity"),
-                        "pressure": item.get("main", {}).get("pressure"),
-                        "wind_speed": item.get("wind", {}).get("speed"),
-                        "wind_direction": item.get("wind", {}).get("deg"),
-                        "clouds": item.get("clouds", {}).get("all"),
-                        "weather_condition": item.get("weather", [{}])[0].get("main"),
-                        "weather_description": item.get("weather", [{}])[0].get("description"),
-                        "source": "OpenWeatherMap",
-                        "forecast": True
-                    })
-                
-                logger.info(f"Fetched {len(records)} forecast records")
-                return records
-                
+                    "temperature": item.get("main", {}).get("temp"),
+                    "humidity": item.get("main", {}).get("humidity"),
+                    "pressure": item.get("main", {}).get("pressure"),
+                    "wind_speed": item.get("wind", {}).get("speed"),
+                    "wind_direction": item.get("wind", {}).get("deg"),
+                    "clouds": item.get("clouds", {}).get("all"),
+                    "weather_condition": item.get("weather", [{}])[0].get("main"),
+                    "weather_description": item.get("weather", [{}])[0].get("description"),
+                    "source": "OpenWeatherMap",
+                    "forecast": True
+                })
+            
+            logger.info(f"Fetched {len(records)} forecast records")
+            return records
+            
         except Exception as e:
             logger.error(f"Error fetching forecast data: {e}")
             return []
     
-    async def save_raw_data(self, data: List[Dict], output_dir: str = "data/raw"):
-        """Save raw weather data to CSV"""
+    async def save_raw_data(
+        self,
+        data: List[Dict],
+        output_dir: str = "data/raw",
+        file_format: str = "parquet"
+    ):
+        """Save raw weather data to Parquet (zstd compressed) or CSV"""
         if not data:
             return
         
-        Path(output_dir).mkdir(parents=True, exist_ok=True)
+        await asyncio.to_thread(Path(output_dir).mkdir, parents=True, exist_ok=True)
         
         df = pd.DataFrame(data)
         timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-        filename = f"{output_dir}/weather_{timestamp}.csv"
+        filename = f"{output_dir}/weather_{timestamp}.{file_format}"
+        
+        if file_format == "csv":
+            await asyncio.to_thread(df.to_csv, filename, index=False)
+        else:
+            # Store timestamps as native Arrow timestamps rather than strings
+            if "timestamp" in df.columns:
+                df["timestamp"] = pd.to_datetime(df["timestamp"], utc=True, errors="coerce")
+            await asyncio.to_thread(
+                df.to_parquet, filename, index=False, compression="zstd", engine="pyarrow"
+            )
         
-        df.to_csv(filename, index=False)
         logger.info(f"Saved weather data to {filename}")
         
         return filename
 
 
-import asyncio
-
-
 # Example usage for testing
 async def test_weather_client():
     """Test the weather client"""
-    client = WeatherClient("your_api_key_here")
-    
-    # Test single location
-    weather = await client.fetch_current_weather(34.05, -118.25)  # Los Angeles
-    print(f"Weather data: {weather}")
-    
-    # Test multiple cities
-    cities = [
-        {"name": "Los Angeles", "lat": 34.05, "lon": -118.25},
-        {"name": "New York", "lat": 40.71, "lon": -74.01},
-        {"name": "Chicago", "lat": 41.88, "lon": -87.63}
-    ]
-    
-    weather_data = await client.fetch_weather_for_cities(cities)
-    print(f"Fetched weather for {len(weather_data)} cities")
-    
-    if weather_data:
-        await client.save_raw_data(weather_data)
+    async with WeatherClient("your_api_key_here") as client:
+        # Test single location
+        weather = await client.fetch_current_weather(34.05, -118.25)  # Los Angeles
+        print(f"Weather data: {weather}")
+        
+        # Test multiple cities
+        cities = [
+            {"name": "Los Angeles", "lat": 34.05, "lon": -118.25},
+            {"name": "New York", "lat": 40.71, "lon": -74.01},
+            {"name": "Chicago", "lat": 41.88, "lon": -87.63}
+        ]
+        
+        weather_data = await client.fetch_weather_for_cities(cities)
+        print(f"Fetched weather for {len(weather_data)} cities")
+        
+        if weather_data:
+            await client.save_raw_data(weather_data)
 
 
 if __name__ == "__main__":
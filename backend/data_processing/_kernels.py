@@ -0,0 +1,164 @@
+import numpy as np
+from numba import njit, prange
+
+EARTH_RADIUS_KM = 6371.0
+
+
+@njit(fastmath=True, parallel=True, cache=True)
+def haversine_km(lat1, lon1, lat2, lon2, out):
+    """
+    Haversine distance in kilometers between paired points, written into `out`.
+    All arrays must be 1-D and of equal length.
+    """
+    deg_to_rad = np.pi / 180.0
+    for i in prange(len(lat2)):
+        phi1 = lat1[i] * deg_to_rad
+        phi2 = lat2[i] * deg_to_rad
+        dlat = phi2 - phi1
+        dlon = (lon2[i] - lon1[i]) * deg_to_rad
+
+        a = np.sin(dlat / 2.0) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(dlon / 2.0) ** 2
+        out[i] = 2.0 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(min(a, 1.0)))
+
+
+@njit(parallel=True, cache=True)
+def segment_zscores(values, starts, ends, z_threshold, z_out, flag_out):
+    """
+    Absolute z-scores within contiguous segments of `values`.
+
+    Each segment [starts[k], ends[k]) is one group (e.g. pollutant type) of a
+    sorted array. Mean and sample std skip NaN; groups with fewer than three
+    values or zero spread, and NaN values, get a z-score of 0.
+    """
+    for k in prange(len(starts)):
+        start = starts[k]
+        end = ends[k]
+
+        total = 0.0
+        count = 0
+        for i in range(start, end):
+            if not np.isnan(values[i]):
+                total += values[i]
+                count += 1
+
+        for i in range(start, end):
+            z_out[i] = 0.0
+            flag_out[i] = False
+
+        if end - start <= 2 or count < 2:
+            continue
+
+        mean = total / count
+        sq_sum = 0.0
+        for i in range(start, end):
+            if not np.isnan(values[i]):
+                sq_sum += (values[i] - mean) ** 2
+        std = np.sqrt(sq_sum / (count - 1))
+
+        if std > 0:
+            for i in range(start, end):
+                if not np.isnan(values[i]):
+                    z = abs(values[i] - mean) / std
+                    z_out[i] = z
+                    flag_out[i] = z > z_threshold
+
+
+@njit(cache=True)
+def fill_forward_backward(values):
+    """
+    Forward-fill NaN in place, then backward-fill any leading NaN.
+    """
+    last = np.nan
+    for i in range(len(values)):
+        if np.isnan(values[i]):
+            values[i] = last
+        else:
+            last = values[i]
+
+    last = np.nan
+    for i in range(len(values) - 1, -1, -1):
+        if np.isnan(values[i]):
+            values[i] = last
+        else:
+            last = values[i]
+
+
+@njit(fastmath=True, parallel=True, cache=True)
+def match_statistics(tempo_lat, tempo_lon, tempo_ts, ground_lat, ground_lon, ground_ts,
+                     ground_values, max_km, max_dt, out_count, out_mean, out_std):
+    """
+    For each TEMPO point, count/mean/std (ddof=0) of ground values within
+    `max_km` and `max_dt` (same units as the timestamps), without building
+    the pairwise distance matrix. Unmatched points get count 0 and NaN stats.
+
+    Coordinates must be given in radians.
+    """
+    cos_ground_lat = np.cos(ground_lat)
+    for i in prange(len(tempo_lat)):
+        phi1 = tempo_lat[i]
+        cos_phi1 = np.cos(phi1)
+
+        count = 0
+        mean = 0.0
+        m2 = 0.0
+        for j in range(len(ground_lat)):
+            if abs(tempo_ts[i] - ground_ts[j]) > max_dt:
+                continue
+
+            dlat = ground_lat[j] - phi1
+            dlon = ground_lon[j] - tempo_lon[i]
+            a = np.sin(dlat / 2.0) ** 2 + cos_phi1 * cos_ground_lat[j] * np.sin(dlon / 2.0) ** 2
+            distance = 2.0 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(min(a, 1.0)))
+            if distance > max_km:
+                continue
+
+            # Welford running mean/variance
+            count += 1
+            delta = ground_values[j] - mean
+            mean += delta / count
+            m2 += delta * (ground_values[j] - mean)
+
+        out_count[i] = count
+        if count > 0:
+            out_mean[i] = mean
+            out_std[i] = np.sqrt(m2 / count)
+        else:
+            out_mean[i] = np.nan
+            out_std[i] = np.nan
+
+
+@njit(cache=True)
+def aqi_piecewise(codes, values, bp_table, n_bands, out_aqi, out_cat):
+    """
+    AQI and category index for mixed-pollutant rows in a single pass.
+
+    `codes` index the first axis of `bp_table` (pollutants x bands x
+    (c_low, c_high, i_low, i_high)), padded past `n_bands[code]`. Rows with a
+    negative code or NaN value get -1 for both outputs. Concentrations above
+    the last band are reported as 500.
+    """
+    for i in range(len(values)):
+        code = codes[i]
+        value = values[i]
+        if code < 0 or np.isnan(value):
+            out_aqi[i] = -1
+            out_cat[i] = -1
+            continue
+
+        last = n_bands[code] - 1
+        if value > bp_table[code, last, 1]:
+            aqi = 500.0
+        else:
+            value = max(value, 0.0)
+            # First band whose upper bound is >= value (bisect_left)
+            k = 0
+            while k < last and bp_table[code, k, 1] < value:
+                k += 1
+            c_low = bp_table[code, k, 0]
+            c_high = bp_table[code, k, 1]
+            i_low = bp_table[code, k, 2]
+            i_high = bp_table[code, k, 3]
+            aqi = (i_high - i_low) / (c_high - c_low) * (value - c_low) + i_low
+
+        out_aqi[i] = np.int64(np.rint(aqi))
+        out_cat[i] = min(np.int64(aqi / 50.0), 5)
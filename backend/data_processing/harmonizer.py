@@ -1,9 +1,11 @@
 import pandas as pd
 import numpy as np
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import Callable, List, Dict, Optional, Tuple, Union
 import logging
-from scipy.interpolate import griddata
+from bisect import bisect_left
+
+from data_processing._kernels import aqi_piecewise, fill_forward_backward
 
 logger = logging.getLogger(__name__)
 
@@ -52,6 +54,104 @@ class DataHarmonizer:
         }
     }
     
+    # Weather fields attached to each harmonized record
+    WEATHER_CONTEXT_FIELDS = ["temperature", "humidity", "wind_speed", "wind_direction", "pressure"]
+    
+    # Harmonized string columns with only a handful of distinct values
+    CATEGORICAL_FIELDS = ["pollutant_type", "source", "data_type", "spatial_resolution", "quality_flag"]
+    
+    # EPA AQI breakpoints, one row per band: (c_low, c_high, i_low, i_high), µg/m³
+    AQI_BREAKPOINTS = {
+        "PM2.5": np.array([
+            (0, 12.0, 0, 50),
+            (12.1, 35.4, 51, 100),
+            (35.5, 55.4, 101, 150),
+            (55.5, 150.4, 151, 200),
+            (150.5, 250.4, 201, 300),
+            (250.5, 500.4, 301, 500)
+        ], dtype=np.float64),
+        "PM10": np.array([
+            (0, 54, 0, 50),
+            (55, 154, 51, 100),
+            (155, 254, 101, 150),
+            (255, 354, 151, 200),
+            (355, 424, 201, 300),
+            (425, 604, 301, 500)
+        ], dtype=np.float64),
+        "O3": np.array([
+            (0, 54, 0, 50),
+            (55, 70, 51, 100),
+            (71, 85, 101, 150),
+            (86, 105, 151, 200),
+            (106, 200, 201, 300)
+        ], dtype=np.float64),
+        "NO2": np.array([
+            (0, 53, 0, 50),
+            (54, 100, 51, 100),
+            (101, 360, 101, 150),
+            (361, 649, 151, 200),
+            (650, 1249, 201, 300),
+            (1250, 2049, 301, 500)
+        ], dtype=np.float64)
+    }
+    
+    AQI_CATEGORIES = (
+        "Good",
+        "Moderate",
+        "Unhealthy for Sensitive Groups",
+        "Unhealthy",
+        "Very Unhealthy",
+        "Hazardous"
+    )
+    
+    # Inclusive upper AQI bound of each category except Hazardous
+    AQI_CATEGORY_CUTS = (50, 100, 150, 200, 300)
+    
+    def __init__(self):
+        # Flat (pollutant, unit) -> factor lookups, built once
+        self._conversion_factors = {
+            (pollutant, unit): factor
+            for pollutant, factors in self.CONVERSION_FACTORS.items()
+            for unit, factor in factors.items()
+        }
+        self._conversion_factor_table = pd.DataFrame(
+            [(*key, factor) for key, factor in self._conversion_factors.items()],
+            columns=["pollutant_type", "unit", "factor"]
+        )
+        
+        # One specialized scalar normalizer per (pollutant, unit) pair
+        self._normalizers: Dict[Tuple[str, str], Callable[[float], Optional[float]]] = {
+            key: self._make_normalizer(factor)
+            for key, factor in self._conversion_factors.items()
+        }
+        self._identity_normalizer = self._make_normalizer(1.0)
+        
+        # Plain-list breakpoint tables for scalar bisect lookups
+        self._aqi_tables = {
+            pollutant: (bp[:, 1].tolist(), [tuple(row) for row in bp.tolist()])
+            for pollutant, bp in self.AQI_BREAKPOINTS.items()
+        }
+        
+        # Padded (pollutant, band, field) breakpoint table for the compiled
+        # mixed-pollutant kernel; pollutant names map to its first axis
+        self._aqi_codes = {pollutant: code for code, pollutant in enumerate(self.AQI_BREAKPOINTS)}
+        max_bands = max(len(bp) for bp in self.AQI_BREAKPOINTS.values())
+        self._aqi_bp_table = np.zeros((len(self.AQI_BREAKPOINTS), max_bands, 4), dtype=np.float64)
+        self._aqi_n_bands = np.empty(len(self.AQI_BREAKPOINTS), dtype=np.int64)
+        for code, bp in enumerate(self.AQI_BREAKPOINTS.values()):
+            self._aqi_bp_table[code, :len(bp)] = bp
+            self._aqi_n_bands[code] = len(bp)
+        self._aqi_category_names = np.asarray(self.AQI_CATEGORIES + ("Unknown",), dtype=object)
+    
+    @staticmethod
+    def _make_normalizer(factor: float) -> Callable[[float], Optional[float]]:
+        """Normalizer with the conversion factor bound as a closure constant"""
+        def normalize(value):
+            if value is None or value != value:
+                return None
+            return float(value) * factor
+        return normalize
+    
     def harmonize_all_data(
         self,
         tempo_data: List[Dict],
@@ -64,23 +164,27 @@ class DataHarmonizer:
         Returns:
             List of harmonized records with schema:
             {
-                timestamp, lat, lon, pollutant_type, value, 
-                source, confidence, weather_context
+                timestamp, lat, lon, pollutant_type, value, aqi,
+                aqi_category, source, confidence, weather_context
             }
         """
-        harmonized = []
+        # Harmonize each source as one columnar batch
+        frames = [
+            frame for frame in (
+                self._harmonize_tempo_batch(tempo_data),
+                self._harmonize_ground_batch(ground_data)
+            )
+            if not frame.empty
+        ]
+        if not frames:
+            logger.info("Harmonized 0 total records")
+            return []
         
-        # Process TEMPO satellite data
-        for record in tempo_data:
-            harmonized_record = self._harmonize_tempo_record(record)
-            if harmonized_record:
-                harmonized.append(harmonized_record)
+        harmonized = pd.concat(frames, ignore_index=True)
         
-        # Process ground sensor data
-        for record in ground_data:
-            harmonized_record = self._harmonize_ground_record(record)
-            if harmonized_record:
-                harmonized.append(harmonized_record)
+        # Low-cardinality string columns as categoricals (codes + one copy per label)
+        categorical = harmonized.columns.intersection(self.CATEGORICAL_FIELDS)
+        harmonized[categorical] = harmonized[categorical].astype("category")
         
         # Enrich with weather data
         harmonized = self._enrich_with_weather(harmonized, weather_data)
@@ -88,112 +192,145 @@ class DataHarmonizer:
         # Handle missing values
         harmonized = self._handle_missing_values(harmonized)
         
+        # AQI depends only on pollutant and value, so compute it once here
+        # instead of on every read
+        harmonized["aqi"], harmonized["aqi_category"] = self.calculate_aqi_many(
+            harmonized["pollutant_type"].tolist(),
+            harmonized["value"].tolist()
+        )
+        
+        # GeoJSON point for the 2dsphere index
+        harmonized["location"] = [
+            {"type": "Point", "coordinates": [lon, lat]}
+            for lon, lat in zip(harmonized["lon"].tolist(), harmonized["lat"].tolist())
+        ]
+        
         logger.info(f"Harmonized {len(harmonized)} total records")
-        return harmonized
+        return harmonized.to_dict("records")
     
-    def _harmonize_tempo_record(self, record: Dict) -> Optional[Dict]:
+    def _harmonize_tempo_batch(self, records: List[Dict]) -> pd.DataFrame:
         """Harmonize TEMPO satellite data"""
-        try:
-            return {
-                "timestamp": self._parse_timestamp(record.get("timestamp")),
-                "lat": float(record.get("lat")),
-                "lon": float(record.get("lon")),
-                "pollutant_type": record.get("pollutant_type"),
-                "value": self._normalize_value(
-                    record.get("value"),
-                    record.get("pollutant_type"),
-                    "µg/m³"
-                ),
-                "source": "TEMPO",
-                "quality_flag": record.get("quality_flag", "unknown"),
-                "uncertainty": record.get("uncertainty"),
-                "data_type": "satellite",
-                "spatial_resolution": "high"
-            }
-        except Exception as e:
-            logger.warning(f"Error harmonizing TEMPO record: {e}")
-            return None
+        df, harmonized = self._harmonize_batch(records, "TEMPO", unit="µg/m³")
+        if harmonized.empty:
+            return harmonized
+        
+        harmonized["quality_flag"] = self._column(df, "quality_flag", "unknown")
+        harmonized["uncertainty"] = self._column(df, "uncertainty")
+        harmonized["data_type"] = "satellite"
+        harmonized["spatial_resolution"] = "high"
+        return harmonized
     
-    def _harmonize_ground_record(self, record: Dict) -> Optional[Dict]:
+    def _harmonize_ground_batch(self, records: List[Dict]) -> pd.DataFrame:
         """Harmonize ground sensor data"""
-        try:
-            return {
-                "timestamp": self._parse_timestamp(record.get("timestamp")),
-                "lat": float(record.get("lat")),
-                "lon": float(record.get("lon")),
-                "pollutant_type": record.get("pollutant_type"),
-                "value": self._normalize_value(
-                    record.get("value"),
-                    record.get("pollutant_type"),
-                    record.get("unit", "µg/m³")
-                ),
-                "source": record.get("source", "Ground"),
-                "city": record.get("city"),
-                "location": record.get("location"),
-                "aqi": record.get("aqi"),
-                "data_type": "ground",
-                "spatial_resolution": "point"
-            }
-        except Exception as e:
-            logger.warning(f"Error harmonizing ground record: {e}")
-            return None
+        df, harmonized = self._harmonize_batch(records, "Ground")
+        if harmonized.empty:
+            return harmonized
+        
+        harmonized["city"] = self._column(df, "city")
+        harmonized["city_lower"] = harmonized["city"].map(
+            lambda city: city.lower() if isinstance(city, str) else None
+        )
+        # Station name; `location` holds the GeoJSON point
+        harmonized["station"] = self._column(df, "location")
+        # AQI as published by the provider; `aqi` is computed from `value`
+        harmonized["reported_aqi"] = self._column(df, "aqi")
+        harmonized["data_type"] = "ground"
+        harmonized["spatial_resolution"] = "point"
+        return harmonized
     
-    def _enrich_with_weather(
+    def _harmonize_batch(
         self,
-        harmonized_data: List[Dict],
-        weather_data: List[Dict]
-    ) -> List[Dict]:
-        """Add weather context to harmonized data"""
-        if not weather_data:
-            return harmonized_data
+        records: List[Dict],
+        source: str,
+        unit: Optional[str] = None
+    ) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        Build the common harmonized columns for a batch of raw records.
         
-        # Create weather lookup by location and time
-        weather_df = pd.DataFrame(weather_data)
+        Values are converted to µg/m³ using `unit` for every row when given,
+        otherwise each record's own unit (default µg/m³). Records without
+        usable coordinates are dropped.
         
-        for record in harmonized_data:
-            # Find nearest weather station
-            nearest_weather = self._find_nearest_weather(
-                record["lat"],
-                record["lon"],
-                record["timestamp"],
-                weather_df
-            )
-            
-            if nearest_weather:
-                record["weather_context"] = {
-                    "temperature": nearest_weather.get("temperature"),
-                    "humidity": nearest_weather.get("humidity"),
-                    "wind_speed": nearest_weather.get("wind_speed"),
-                    "wind_direction": nearest_weather.get("wind_direction"),
-                    "pressure": nearest_weather.get("pressure")
-                }
-        
-        return harmonized_data
+        Returns:
+            Tuple of (raw frame, harmonized frame), row-aligned
+        """
+        df = pd.DataFrame(records)
+        if df.empty:
+            return df, pd.DataFrame()
+        
+        lat = pd.to_numeric(self._column(df, "lat"), errors="coerce")
+        lon = pd.to_numeric(self._column(df, "lon"), errors="coerce")
+        valid = lat.notna() & lon.notna()
+        if not valid.all():
+            logger.warning(f"Dropping {(~valid).sum()} {source} records without coordinates")
+            df, lat, lon = df[valid], lat[valid], lon[valid]
+        
+        pollutant = self._column(df, "pollutant_type")
+        units = pd.Series(unit, index=df.index) if unit else self._column(df, "unit", "µg/m³")
+        
+        # Per-row conversion factor, 1.0 for unknown pollutant/unit pairs
+        factors = pd.DataFrame({"pollutant_type": pollutant, "unit": units}).merge(
+            self._conversion_factor_table,
+            on=["pollutant_type", "unit"],
+            how="left"
+        )["factor"].fillna(1.0).to_numpy()
+        
+        value = pd.to_numeric(self._column(df, "value"), errors="coerce").to_numpy() * factors
+        
+        harmonized = pd.DataFrame({
+            "timestamp": self._parse_timestamps(self._column(df, "timestamp")),
+            "lat": lat.astype(float),
+            "lon": lon.astype(float),
+            "pollutant_type": pollutant,
+            "value": value,
+            "source": self._column(df, "source", source)
+        })
+        return df, harmonized
+    
+    @staticmethod
+    def _column(df: pd.DataFrame, name: str, default=None) -> pd.Series:
+        """Column `name` with missing entries set to `default`"""
+        if name not in df.columns:
+            return pd.Series(default, index=df.index, dtype=object)
+        if default is None:
+            return df[name]
+        return df[name].fillna(default)
     
-    def _find_nearest_weather(
+    def _enrich_with_weather(
         self,
-        lat: float,
-        lon: float,
-        timestamp: str,
-        weather_df: pd.DataFrame
-    ) -> Optional[Dict]:
-        """Find nearest weather station data"""
+        harmonized: pd.DataFrame,
+        weather_data: List[Dict]
+    ) -> pd.DataFrame:
+        """Add weather context from the nearest weather station (within 0.5 degrees)"""
+        if not weather_data or harmonized.empty:
+            return harmonized
+        
+        weather_df = pd.DataFrame(weather_data)
+        if "lat" not in weather_df.columns or "lon" not in weather_df.columns:
+            return harmonized
+        weather_df = weather_df.dropna(subset=["lat", "lon"])
         if weather_df.empty:
-            return None
+            return harmonized
         
-        # Calculate distances
-        weather_df["distance"] = np.sqrt(
-            (weather_df["lat"] - lat) ** 2 + 
-            (weather_df["lon"] - lon) ** 2
-        )
+        # Deferred so importing the harmonizer doesn't load scipy
+        from scipy.spatial import cKDTree
         
-        # Find closest within reasonable distance (e.g., 0.5 degrees)
-        nearest = weather_df[weather_df["distance"] < 0.5].sort_values("distance").head(1)
+        contexts = weather_df.reindex(columns=self.WEATHER_CONTEXT_FIELDS).to_dict("records")
         
-        if nearest.empty:
-            return None
+        # Single nearest-neighbour query for all records against one KD-tree
+        tree = cKDTree(weather_df[["lat", "lon"]].to_numpy(dtype=float))
+        distances, indices = tree.query(
+            harmonized[["lat", "lon"]].to_numpy(dtype=float),
+            k=1,
+            distance_upper_bound=0.5
+        )
+        
+        harmonized["weather_context"] = [
+            dict(contexts[index]) if np.isfinite(distance) else None
+            for distance, index in zip(distances, indices)
+        ]
         
-        return nearest.iloc[0].to_dict()
+        return harmonized
     
     def _normalize_value(
         self,
@@ -202,41 +339,45 @@ class DataHarmonizer:
         unit: str
     ) -> float:
         """Normalize pollutant values to µg/m³"""
-        if pd.isna(value):
-            return None
+        return self._normalizers.get((pollutant, unit), self._identity_normalizer)(value)
+    
+    def _parse_timestamps(self, timestamps: pd.Series) -> pd.Series:
+        """
+        Parse and standardize timestamps to naive UTC datetimes (stored as BSON dates).
         
-        if pollutant not in self.CONVERSION_FACTORS:
-            return float(value)
+        Missing or unparseable values get the current time.
+        """
+        parsed = pd.to_datetime(timestamps, format="ISO8601", utc=True, errors="coerce")
         
-        conversion = self.CONVERSION_FACTORS[pollutant].get(unit, 1.0)
-        return float(value) * conversion
-    
-    def _parse_timestamp(self, timestamp) -> str:
-        """Parse and standardize timestamp to ISO format"""
-        if isinstance(timestamp, str):
-            try:
-                dt = pd.to_datetime(timestamp)
-                return dt.isoformat()
-            except:
-                return timestamp
-        elif isinstance(timestamp, datetime):
-            return timestamp.isoformat()
-        else:
-            return datetime.utcnow().isoformat()
+        # Re-parse only the rows the ISO fast path rejected
+        failed = parsed.isna() & timestamps.notna()
+        if failed.any():
+            parsed[failed] = pd.to_datetime(
+                timestamps[failed].astype(str), format="mixed", utc=True, errors="coerce"
+            )
+        
+        parsed = parsed.dt.tz_localize(None).dt.floor("s")
+        
+        unparsed = parsed.isna()
+        if unparsed.any():
+            logger.warning(f"{unparsed.sum()} records without a parseable timestamp, using current time")
+            parsed = parsed.mask(unparsed, pd.Timestamp(datetime.utcnow()).floor("s"))
+        
+        return parsed
     
-    def _handle_missing_values(self, data: List[Dict]) -> List[Dict]:
+    def _handle_missing_values(self, df: pd.DataFrame) -> pd.DataFrame:
         """Handle missing values with interpolation where appropriate"""
-        df = pd.DataFrame(data)
-        
         # Group by pollutant type and location
         numeric_cols = ["value", "lat", "lon"]
         
         for col in numeric_cols:
             if col in df.columns:
                 # Simple forward fill for now
-                df[col] = df[col].fillna(method='ffill').fillna(method='bfill')
+                values = df[col].to_numpy(dtype=np.float64, copy=True)
+                fill_forward_backward(values)
+                df[col] = values
         
-        return df.to_dict('records')
+        return df
     
     def calculate_aqi(self, pollutant: str, concentration: float) -> Dict:
         """
@@ -246,99 +387,129 @@ class DataHarmonizer:
         Returns:
             Dict with aqi value and category
         """
-        # EPA AQI breakpoints (concentration ranges in µg/m³)
-        breakpoints = {
-            "PM2.5": [
-                (0, 12.0, 0, 50),
-                (12.1, 35.4, 51, 100),
-                (35.5, 55.4, 101, 150),
-                (55.5, 150.4, 151, 200),
-                (150.5, 250.4, 201, 300),
-                (250.5, 500.4, 301, 500)
-            ],
-            "PM10": [
-                (0, 54, 0, 50),
-                (55, 154, 51, 100),
-                (155, 254, 101, 150),
-                (255, 354, 151, 200),
-                (355, 424, 201, 300),
-                (425, 604, 301, 500)
-            ],
-            "O3": [
-                (0, 54, 0, 50),
-                (55, 70, 51, 100),
-                (71, 85, 101, 150),
-                (86, 105, 151, 200),
-                (106, 200, 201, 300)
-            ],
-            "NO2": [
-                (0, 53, 0, 50),
-                (54, 100, 51, 100),
-                (101, 360, 101, 150),
-                (361, 649, 151, 200),
-                (650, 1249, 201, 300),
-                (1250, 2049, 301, 500)
-            ]
-        }
+        aqi, category = self.calculate_aqi_fast(pollutant, concentration)
+        return {"aqi": aqi, "category": category}
+    
+    def calculate_aqi_fast(
+        self,
+        pollutant: str,
+        concentration: Optional[float]
+    ) -> Tuple[Optional[int], str]:
+        """
+        Scalar AQI lookup with a single bisect over the band upper bounds.
+        Same banding as calculate_aqi_many, without numpy dispatch overhead.
         
-        categories = [
-            "Good",
-            "Moderate",
-            "Unhealthy for Sensitive Groups",
-            "Unhealthy",
-            "Very Unhealthy",
-            "Hazardous"
-        ]
+        Returns:
+            Tuple of (AQI value, category); (None, "Unknown") for unknown
+            pollutants or missing concentrations
+        """
+        table = self._aqi_tables.get(pollutant)
+        if table is None or concentration is None or concentration != concentration:
+            return None, "Unknown"
+        
+        c_highs, bands = table
+        if concentration > c_highs[-1]:
+            return 500, "Hazardous"
         
-        if pollutant not in breakpoints:
-            return {"aqi": None, "category": "Unknown"}
-        
-        for bp in breakpoints[pollutant]:
-            c_low, c_high, i_low, i_high = bp
-            if c_low <= concentration <= c_high:
-                aqi = ((i_high - i_low) / (c_high - c_low)) * (concentration - c_low) + i_low
-                category_index = min(int(aqi / 50), len(categories) - 1)
-                return {
-                    "aqi": round(aqi),
-                    "category": categories[category_index]
-                }
-        
-        # If concentration exceeds all breakpoints
-        return {"aqi": 500, "category": "Hazardous"}
+        concentration = max(float(concentration), 0.0)
+        c_low, c_high, i_low, i_high = bands[bisect_left(c_highs, concentration)]
+        aqi = (i_high - i_low) / (c_high - c_low) * (concentration - c_low) + i_low
+        
+        category_idx = min(int(aqi / 50), len(self.AQI_CATEGORIES) - 1)
+        return round(aqi), self.AQI_CATEGORIES[category_idx]
+    
+    def aqi_category(self, aqi: float) -> str:
+        """Category for an AQI value, using inclusive upper bounds (50 is Good)"""
+        return self.AQI_CATEGORIES[bisect_left(self.AQI_CATEGORY_CUTS, aqi)]
+    
+    def calculate_aqi_many(
+        self,
+        pollutants: List[Optional[str]],
+        concentrations: List[Optional[float]]
+    ) -> Tuple[List[Optional[int]], List[str]]:
+        """
+        Calculate AQI for mixed-pollutant records in one compiled pass.
+        
+        Returns:
+            Tuple of (AQI values, categories), aligned with the inputs;
+            (None, "Unknown") for unknown pollutants or missing concentrations
+        """
+        codes = np.fromiter(
+            (self._aqi_codes.get(pollutant, -1) for pollutant in pollutants),
+            dtype=np.int64,
+            count=len(pollutants)
+        )
+        conc = np.asarray(concentrations, dtype=np.float64)
+        
+        out_aqi = np.empty(len(conc), dtype=np.int64)
+        out_cat = np.empty(len(conc), dtype=np.int64)
+        aqi_piecewise(codes, conc, self._aqi_bp_table, self._aqi_n_bands, out_aqi, out_cat)
+        
+        aqi = out_aqi.astype(object)
+        aqi[out_aqi < 0] = None
+        
+        # Category -1 selects the trailing "Unknown"
+        return aqi.tolist(), self._aqi_category_names[out_cat].tolist()
     
     def aggregate_by_location(
         self,
-        data: List[Dict],
+        data: Union[List[Dict], pd.DataFrame],
         grid_size: float = 0.1
     ) -> List[Dict]:
         """
         Aggregate data by grid cells for mapping.
         
         Args:
-            data: Harmonized data
+            data: Harmonized records or DataFrame
             grid_size: Grid cell size in degrees
         
         Returns:
             Aggregated data by grid cell
         """
         df = pd.DataFrame(data)
+        if df.empty:
+            return []
+        df = df.dropna(subset=["lat", "lon", "pollutant_type"])
+        if df.empty:
+            return []
         
-        # Create grid cells
-        df["lat_grid"] = (df["lat"] / grid_size).round() * grid_size
-        df["lon_grid"] = (df["lon"] / grid_size).round() * grid_size
-        
-        # Aggregate by grid cell and pollutant
-        aggregated = df.groupby(
-            ["lat_grid", "lon_grid", "pollutant_type"]
-        ).agg({
-            "value": ["mean", "std", "count"],
-            "timestamp": "max"
-        }).reset_index()
-        
-        aggregated.columns = [
-            "lat", "lon", "pollutant_type",
-            "value_mean", "value_std", "count", "timestamp"
-        ]
+        # Integer grid cell and pollutant codes, packed into one key per row
+        lat_idx = np.rint(df["lat"].to_numpy(dtype=float) / grid_size).astype(np.int64)
+        lon_idx = np.rint(df["lon"].to_numpy(dtype=float) / grid_size).astype(np.int64)
+        pollutant_codes, pollutants = pd.factorize(df["pollutant_type"], sort=True)
+        
+        lat_min, lon_min = lat_idx.min(), lon_idx.min()
+        dims = (lat_idx.max() - lat_min + 1, lon_idx.max() - lon_min + 1, len(pollutants))
+        keys = np.ravel_multi_index((lat_idx - lat_min, lon_idx - lon_min, pollutant_codes), dims)
+        
+        unique_keys, inverse = np.unique(keys, return_inverse=True)
+        
+        # Per-cell count/sum/sum of squares in single passes (NaN values skipped)
+        values = df["value"].to_numpy(dtype=float)
+        present = ~np.isnan(values)
+        values = np.where(present, values, 0.0)
+        
+        count = np.bincount(inverse, weights=present, minlength=len(unique_keys))
+        total = np.bincount(inverse, weights=values, minlength=len(unique_keys))
+        total_sq = np.bincount(inverse, weights=values * values, minlength=len(unique_keys))
+        
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = total / count
+            var = (total_sq - count * mean ** 2) / (count - 1)
+        std = np.where(count > 1, np.sqrt(np.maximum(var, 0.0)), np.nan)
+        
+        lat_cell, lon_cell, pollutant_cell = np.unravel_index(unique_keys, dims)
+        latest = df["timestamp"].groupby(inverse).max().to_numpy()
+        
+        aggregated = pd.DataFrame({
+            "lat": (lat_cell + lat_min) * grid_size,
+            "lon": (lon_cell + lon_min) * grid_size,
+            "pollutant_type": pollutants.take(pollutant_cell),
+            "value_mean": mean,
+            "value_std": std,
+            "count": count.astype(np.int64),
+            "timestamp": latest
+        })
         
         return aggregated.to_dict('records')
 
@@ -1,9 +1,11 @@
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-from typing import List, Dict, Tuple, Optional
+from typing import List, Dict, Tuple, Optional, Union
 import logging
 
+from data_processing._kernels import haversine_km, match_statistics, segment_zscores
+
 logger = logging.getLogger(__name__)
 
 
@@ -42,141 +44,149 @@ class DataValidator:
         tempo_df = pd.DataFrame(tempo_data)
         ground_df = pd.DataFrame(ground_data)
         
-        # Convert timestamps to datetime
-        tempo_df["timestamp"] = pd.to_datetime(tempo_df["timestamp"])
-        ground_df["timestamp"] = pd.to_datetime(ground_df["timestamp"])
-        
-        validation_results = []
-        
-        # For each TEMPO measurement, find matching ground measurements
-        for _, tempo_record in tempo_df.iterrows():
-            matches = self._find_matching_ground_measurements(
-                tempo_record,
-                ground_df,
+        # Convert timestamps to datetime (naive timestamps are treated as UTC)
+        tempo_df["timestamp"] = pd.to_datetime(tempo_df["timestamp"], utc=True)
+        ground_df["timestamp"] = pd.to_datetime(ground_df["timestamp"], utc=True)
+        
+        n_tempo = len(tempo_df)
+        ground_count = np.zeros(n_tempo, dtype=np.int64)
+        ground_mean = np.full(n_tempo, np.nan)
+        ground_std = np.full(n_tempo, np.nan)
+        
+        # Match each TEMPO measurement against ground measurements of the same
+        # pollutant using broadcast distance/time matrices
+        for pollutant, tempo_idx in tempo_df.groupby("pollutant_type").indices.items():
+            ground_subset = ground_df[ground_df["pollutant_type"] == pollutant]
+            if ground_subset.empty:
+                continue
+            
+            counts, means, stds = self._match_ground_statistics(
+                tempo_df.iloc[tempo_idx],
+                ground_subset,
                 max_distance_km,
                 max_time_diff_hours
             )
-            
-            if matches:
-                validation = self._calculate_validation_metrics(
-                    tempo_record,
-                    matches
-                )
-                validation_results.append(validation)
+            ground_count[tempo_idx] = counts
+            ground_mean[tempo_idx] = means
+            ground_std[tempo_idx] = stds
+        
+        matched = ground_count > 0
+        validation_results = self._calculate_validation_metrics(
+            tempo_df[matched],
+            ground_mean[matched],
+            ground_std[matched],
+            ground_count[matched]
+        )
         
         logger.info(f"Validated {len(validation_results)} TEMPO records")
         return validation_results
     
-    def _find_matching_ground_measurements(
+    def _match_ground_statistics(
         self,
-        tempo_record: pd.Series,
+        tempo_df: pd.DataFrame,
         ground_df: pd.DataFrame,
         max_distance_km: float,
         max_time_diff_hours: float
-    ) -> pd.DataFrame:
-        """Find ground measurements that match TEMPO record spatially and temporally"""
-        # Filter by pollutant type
-        matches = ground_df[
-            ground_df["pollutant_type"] == tempo_record["pollutant_type"]
-        ].copy()
-        
-        if matches.empty:
-            return matches
-        
-        # Calculate spatial distance (approximate)
-        matches["distance_km"] = self._haversine_distance(
-            tempo_record["lat"],
-            tempo_record["lon"],
-            matches["lat"],
-            matches["lon"]
-        )
-        
-        # Filter by distance
-        matches = matches[matches["distance_km"] <= max_distance_km]
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Count, mean and std of the ground values within range of each TEMPO record.
         
-        # Calculate time difference
-        matches["time_diff_hours"] = abs(
-            (matches["timestamp"] - tempo_record["timestamp"]).dt.total_seconds() / 3600
+        Distance, time window and reduction are fused in one compiled kernel.
+        """
+        tempo_ts = tempo_df["timestamp"].to_numpy(dtype="datetime64[ns]").astype(np.int64)
+        ground_ts = ground_df["timestamp"].to_numpy(dtype="datetime64[ns]").astype(np.int64)
+        
+        counts = np.empty(len(tempo_df), dtype=np.int64)
+        means = np.empty(len(tempo_df), dtype=np.float64)
+        stds = np.empty(len(tempo_df), dtype=np.float64)
+        
+        # Convert coordinates to radians once rather than per pair
+        match_statistics(
+            np.radians(tempo_df["lat"].to_numpy(dtype=np.float64)),
+            np.radians(tempo_df["lon"].to_numpy(dtype=np.float64)),
+            tempo_ts,
+            np.radians(ground_df["lat"].to_numpy(dtype=np.float64)),
+            np.radians(ground_df["lon"].to_numpy(dtype=np.float64)),
+            ground_ts,
+            ground_df["value"].to_numpy(dtype=np.float64),
+            float(max_distance_km),
+            np.int64(max_time_diff_hours * 3600 * 1e9),
+            counts,
+            means,
+            stds
         )
         
-        # Filter by time
-        matches = matches[matches["time_diff_hours"] <= max_time_diff_hours]
-        
-        return matches
+        return counts, means, stds
     
     def _calculate_validation_metrics(
         self,
-        tempo_record: pd.Series,
-        ground_matches: pd.DataFrame
-    ) -> Dict:
+        tempo_df: pd.DataFrame,
+        ground_mean: np.ndarray,
+        ground_std: np.ndarray,
+        ground_count: np.ndarray
+    ) -> List[Dict]:
         """Calculate validation metrics comparing TEMPO and ground data"""
-        tempo_value = tempo_record["value"]
-        ground_values = ground_matches["value"].values
-        ground_mean = np.mean(ground_values)
-        ground_std = np.std(ground_values)
-        
-        # Calculate relative difference
-        if ground_mean > 0:
-            relative_diff = abs(tempo_value - ground_mean) / ground_mean
-        else:
-            relative_diff = 0.0
-        
-        # Calculate absolute difference
-        absolute_diff = abs(tempo_value - ground_mean)
-        
-        # Determine if discrepancy exceeds threshold
-        high_discrepancy = relative_diff > self.discrepancy_threshold
-        
-        # Calculate confidence score (inverse of discrepancy)
-        confidence = max(0.0, 1.0 - relative_diff)
-        
-        # Determine confidence level
-        if confidence >= 0.8:
-            confidence_level = "high"
-        elif confidence >= 0.6:
-            confidence_level = "medium"
-        else:
-            confidence_level = "low"
-        
-        return {
-            "timestamp": tempo_record["timestamp"].isoformat(),
-            "lat": tempo_record["lat"],
-            "lon": tempo_record["lon"],
-            "pollutant_type": tempo_record["pollutant_type"],
+        if tempo_df.empty:
+            return []
+        
+        tempo_value = tempo_df["value"].to_numpy(dtype=float)
+        
+        # Calculate relative and absolute difference
+        absolute_diff = np.abs(tempo_value - ground_mean)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            relative_diff = np.where(ground_mean > 0, absolute_diff / ground_mean, 0.0)
+        
+        # Confidence score (inverse of discrepancy) and level
+        confidence = np.maximum(0.0, 1.0 - relative_diff)
+        confidence_level = np.select(
+            [confidence >= 0.8, confidence >= 0.6],
+            ["high", "medium"],
+            default="low"
+        )
+        
+        results = pd.DataFrame({
+            "timestamp": tempo_df["timestamp"].dt.tz_convert(None).to_numpy(dtype=object),
+            "lat": tempo_df["lat"].to_numpy(),
+            "lon": tempo_df["lon"].to_numpy(),
+            "pollutant_type": tempo_df["pollutant_type"].to_numpy(),
             "tempo_value": tempo_value,
             "ground_mean": ground_mean,
             "ground_std": ground_std,
-            "ground_count": len(ground_matches),
+            "ground_count": ground_count,
             "relative_diff": relative_diff,
             "absolute_diff": absolute_diff,
-            "high_discrepancy": high_discrepancy,
+            "high_discrepancy": relative_diff > self.discrepancy_threshold,
             "confidence": confidence,
             "confidence_level": confidence_level,
             "validation_status": "validated"
-        }
+        })
+        
+        return results.to_dict("records")
     
     def _haversine_distance(
         self,
-        lat1: float,
-        lon1: float,
-        lat2: pd.Series,
-        lon2: pd.Series
-    ) -> pd.Series:
+        lat1,
+        lon1,
+        lat2,
+        lon2
+    ) -> np.ndarray:
         """
         Calculate haversine distance between points in kilometers.
-        Vectorized for efficiency.
+        Inputs are broadcast against each other; the result has the broadcast shape.
         """
-        R = 6371  # Earth radius in kilometers
-        
-        lat1_rad = np.radians(lat1)
-        lat2_rad = np.radians(lat2)
-        dlat = np.radians(lat2 - lat1)
-        dlon = np.radians(lon2 - lon1)
+        lat1, lon1, lat2, lon2 = np.broadcast_arrays(
+            np.asarray(lat1, dtype=np.float64),
+            np.asarray(lon1, dtype=np.float64),
+            np.asarray(lat2, dtype=np.float64),
+            np.asarray(lon2, dtype=np.float64)
+        )
         
-        a = np.sin(dlat / 2) ** 2 + np.cos(lat1_rad) * np.cos(lat2_rad) * np.sin(dlon / 2) ** 2
-        c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+        out = np.empty(lat1.shape, dtype=np.float64)
+        haversine_km(
+            lat1.ravel(), lon1.ravel(), lat2.ravel(), lon2.ravel(), out.reshape(-1)
+        )
         
-        return R * c
+        return out
     
     def generate_quality_report(
         self,
@@ -191,19 +201,32 @@ class DataValidator:
         
         df = pd.DataFrame(validation_results)
         
+        confidence = df["confidence"].to_numpy(dtype=float)
+        relative_diff = df["relative_diff"].to_numpy(dtype=float)
+        high_discrepancy = df["high_discrepancy"].to_numpy(dtype=bool)
+        
+        levels, level_counts = np.unique(df["confidence_level"].to_numpy(dtype=str), return_counts=True)
+        level_counts = dict(zip(levels, level_counts.tolist()))
+        
+        by_pollutant = pd.DataFrame({
+            "confidence": confidence,
+            "relative_diff": relative_diff,
+            "high_discrepancy": high_discrepancy
+        }).groupby(df["pollutant_type"].to_numpy())
+        
         report = {
             "total_validations": len(df),
-            "high_confidence_count": len(df[df["confidence_level"] == "high"]),
-            "medium_confidence_count": len(df[df["confidence_level"] == "medium"]),
-            "low_confidence_count": len(df[df["confidence_level"] == "low"]),
-            "high_discrepancy_count": len(df[df["high_discrepancy"]]),
-            "mean_confidence": df["confidence"].mean(),
-            "mean_relative_diff": df["relative_diff"].mean(),
-            "pollutant_breakdown": df.groupby("pollutant_type").agg({
-                "confidence": "mean",
-                "relative_diff": "mean",
-                "high_discrepancy": "sum"
-            }).to_dict()
+            "high_confidence_count": level_counts.get("high", 0),
+            "medium_confidence_count": level_counts.get("medium", 0),
+            "low_confidence_count": level_counts.get("low", 0),
+            "high_discrepancy_count": int(high_discrepancy.sum()),
+            "mean_confidence": float(np.nanmean(confidence)),
+            "mean_relative_diff": float(np.nanmean(relative_diff)),
+            "pollutant_breakdown": {
+                "confidence": by_pollutant["confidence"].mean().to_dict(),
+                "relative_diff": by_pollutant["relative_diff"].mean().to_dict(),
+                "high_discrepancy": by_pollutant["high_discrepancy"].sum().to_dict()
+            }
         }
         
         # Add percentages
@@ -214,44 +237,53 @@ class DataValidator:
     
     def flag_anomalies(
         self,
-        data: List[Dict],
+        data: Union[List[Dict], pd.DataFrame],
         z_threshold: float = 3.0
     ) -> List[Dict]:
         """
         Flag anomalous values using z-score method.
         
         Args:
-            data: Harmonized data records
+            data: Harmonized records or DataFrame
             z_threshold: Z-score threshold for anomaly detection
         
         Returns:
             Data with anomaly flags added
         """
-        df = pd.DataFrame(data)
+        df = data.copy() if isinstance(data, pd.DataFrame) else pd.DataFrame(data)
         
         if df.empty:
-            return data
+            return df.to_dict('records')
+        
+        # Sort once by pollutant type so each group is a contiguous segment
+        codes, _ = pd.factorize(df["pollutant_type"])
+        order = np.argsort(codes, kind="stable")
+        sorted_codes = codes[order]
+        
+        group_codes, starts = np.unique(sorted_codes, return_index=True)
+        ends = np.append(starts[1:], len(sorted_codes))
+        
+        # Missing pollutant types (code -1) are never scored
+        valid = group_codes >= 0
+        
+        z_sorted = np.zeros(len(df), dtype=np.float64)
+        flag_sorted = np.zeros(len(df), dtype=np.bool_)
+        segment_zscores(
+            df["value"].to_numpy(dtype=np.float64)[order],
+            starts[valid],
+            ends[valid],
+            z_threshold,
+            z_sorted,
+            flag_sorted
+        )
         
-        # Calculate z-scores by pollutant type
-        for pollutant in df["pollutant_type"].unique():
-            mask = df["pollutant_type"] == pollutant
-            values = df.loc[mask, "value"]
-            
-            if len(values) > 2:
-                mean = values.mean()
-                std = values.std()
-                
-                if std > 0:
-                    z_scores = np.abs((values - mean) / std)
-                    df.loc[mask, "z_score"] = z_scores
-                    df.loc[mask, "is_anomaly"] = z_scores > z_threshold
-                else:
-                    df.loc[mask, "z_score"] = 0
-                    df.loc[mask, "is_anomaly"] = False
-        
-        # Fill NaN values
-        df["is_anomaly"] = df["is_anomaly"].fillna(False)
-        df["z_score"] = df["z_score"].fillna(0)
+        z_scores = np.empty_like(z_sorted)
+        z_scores[order] = z_sorted
+        is_anomaly = np.empty_like(flag_sorted)
+        is_anomaly[order] = flag_sorted
+        
+        df["z_score"] = z_scores
+        df["is_anomaly"] = is_anomaly
         
         logger.info(f"Flagged {df['is_anomaly'].sum()} anomalies out of {len(df)} records")
         
@@ -1,10 +1,16 @@
 from motor.motor_asyncio import AsyncIOMotorClient
-from typing import Optional
+from typing import Optional, List, Dict, Union
+import asyncio
+from datetime import datetime
+import pandas as pd
+from pymongo.errors import BulkWriteError
 from config import settings
 import logging
 
 logger = logging.getLogger(__name__)
 
+DUPLICATE_KEY_ERROR = 11000
+
 
 class Database:
     client: Optional[AsyncIOMotorClient] = None
@@ -14,31 +20,58 @@ class Database:
     async def connect_db(cls):
         """Connect to MongoDB"""
         try:
-            cls.client = AsyncIOMotorClient(settings.mongodb_uri)
+            # One pooled client per process; warm connections avoid per-request handshakes
+            cls.client = AsyncIOMotorClient(
+                settings.mongodb_uri,
+                maxPoolSize=settings.mongodb_max_pool_size,
+                minPoolSize=settings.mongodb_min_pool_size
+            )
             cls.db = cls.client.get_default_database()
             
-            # Create indexes
-            await cls.db.harmonized_data.create_index([("timestamp", -1)])
-            await cls.db.harmonized_data.create_index([("location", "2dsphere")])
-            await cls.db.harmonized_data.create_index([("pollutant_type", 1)])
-            
-            await cls.db.forecasts.create_index([("timestamp", -1)])
-            await cls.db.forecasts.create_index([("city", 1)])
-            
-            await cls.db.raw_tempo.create_index([("timestamp", -1)])
-            await cls.db.raw_ground.create_index([("timestamp", -1)])
-            await cls.db.raw_weather.create_index([("timestamp", -1)])
-            
-            # Email subscribers indexes
-            await cls.db.subscribers.create_index([("email", 1)], unique=True)
-            await cls.db.subscribers.create_index([("subscription_status", 1)])
-            await cls.db.subscribers.create_index([("location.city", 1)])
+            raw_ttl_seconds = settings.raw_data_retention_hours * 3600
             
-            # Citizen reports indexes
-            await cls.db.citizen_reports.create_index([("timestamp", -1)])
-            await cls.db.citizen_reports.create_index([("location", "2dsphere")])
-            await cls.db.citizen_reports.create_index([("type", 1)])
-            await cls.db.citizen_reports.create_index([("status", 1)])
+            # Create indexes (issued concurrently, one round-trip overall)
+            await asyncio.gather(
+                cls.db.harmonized_data.create_index([("timestamp", -1), ("pollutant_type", 1)]),
+                cls.db.harmonized_data.create_index(
+                    [("location", "2dsphere"), ("pollutant_type", 1), ("timestamp", -1)]
+                ),
+                cls.db.harmonized_data.create_index([("pollutant_type", 1), ("timestamp", -1)]),
+                cls.db.harmonized_data.create_index([("city_lower", 1), ("timestamp", -1)]),
+                # One ground reading per station, pollutant and time, so re-fetches are skipped
+                cls.db.harmonized_data.create_index(
+                    [("source", 1), ("station", 1), ("pollutant_type", 1), ("timestamp", 1)],
+                    unique=True,
+                    partialFilterExpression={"data_type": "ground", "station": {"$type": "string"}}
+                ),
+                
+                cls.db.forecasts.create_index([("timestamp", -1)]),
+                cls.db.forecasts.create_index([("city", 1), ("timestamp", -1)]),
+                cls.db.forecasts.create_index([("city_lower", 1), ("timestamp", -1)]),
+                cls.db.forecasts.create_index([("location", "2dsphere"), ("timestamp", -1)]),
+                cls.db.forecasts.create_index([("generated_at", -1), ("city_lower", 1)]),
+                
+                cls.db.validation_results.create_index([("timestamp", -1)]),
+                
+                cls.db.raw_tempo.create_index([("timestamp", -1)]),
+                cls.db.raw_ground.create_index([("timestamp", -1)]),
+                cls.db.raw_weather.create_index([("timestamp", -1)]),
+                
+                # Raw data retention (applies to documents with a BSON date timestamp)
+                cls.db.raw_tempo.create_index([("timestamp", 1)], expireAfterSeconds=raw_ttl_seconds),
+                cls.db.raw_ground.create_index([("timestamp", 1)], expireAfterSeconds=raw_ttl_seconds),
+                cls.db.raw_weather.create_index([("timestamp", 1)], expireAfterSeconds=raw_ttl_seconds),
+                
+                # Email subscribers indexes
+                cls.db.subscribers.create_index([("email", 1)], unique=True),
+                cls.db.subscribers.create_index([("subscription_status", 1), ("location.city", 1)]),
+                
+                # Citizen reports indexes
+                cls.db.citizen_reports.create_index([("timestamp", -1)]),
+                cls.db.citizen_reports.create_index([("location", "2dsphere")]),
+                cls.db.citizen_reports.create_index([("type", 1)]),
+                cls.db.citizen_reports.create_index([("status", 1)])
+            )
             
             logger.info("Successfully connected to MongoDB")
         except Exception as e:
@@ -52,11 +85,81 @@ class Database:
             cls.client.close()
             logger.info("MongoDB connection closed")
     
+    @classmethod
+    async def bulk_insert(
+        cls,
+        collection_name: str,
+        records: Union[List[Dict], pd.DataFrame],
+        chunk_size: int = 1000
+    ) -> int:
+        """
+        Insert a batch of documents in unordered chunks.
+        
+        Records must already be BSON-encodable (datetime timestamps, no
+        numpy-only types). Unordered inserts let the server keep going past
+        individual document failures; duplicate-key rejections are expected
+        for re-fetched readings and are skipped, any other write error is raised.
+        
+        Returns:
+            Number of documents inserted
+        """
+        if isinstance(records, pd.DataFrame):
+            records = records.to_dict("records")
+        
+        collection = cls.db[collection_name]
+        inserted = 0
+        for start in range(0, len(records), chunk_size):
+            try:
+                result = await collection.insert_many(
+                    records[start:start + chunk_size],
+                    ordered=False
+                )
+                inserted += len(result.inserted_ids)
+            except BulkWriteError as e:
+                errors = e.details.get("writeErrors", [])
+                if any(error.get("code") != DUPLICATE_KEY_ERROR for error in errors):
+                    raise
+                inserted += e.details.get("nInserted", 0)
+        
+        return inserted
+    
+    @classmethod
+    async def mark_refreshed(cls, collection_name: str):
+        """Record that new documents were written to a collection"""
+        await cls.db.refresh_markers.update_one(
+            {"_id": collection_name},
+            {"$set": {"refreshed_at": datetime.utcnow()}},
+            upsert=True
+        )
+    
+    @classmethod
+    async def last_refreshed(cls, collection_name: str) -> Optional[datetime]:
+        """When a collection last received new documents, if recorded"""
+        marker = await cls.db.refresh_markers.find_one({"_id": collection_name})
+        return marker.get("refreshed_at") if marker else None
+    
     @classmethod
     def get_db(cls):
         """Get database instance"""
         return cls.db
 
 
+def to_bson_dates(records: List[Dict], fields=("timestamp",)) -> List[Dict]:
+    """
+    Convert ISO-string timestamp fields to naive UTC datetimes in place so
+    they are stored as BSON dates. Unparseable values are left unchanged.
+    """
+    for field in fields:
+        values = pd.Series([record.get(field) for record in records], dtype=object)
+        parsed = pd.to_datetime(values, format="ISO8601", utc=True, errors="coerce")
+        parsed = parsed.dt.tz_localize(None)
+        
+        for record, timestamp in zip(records, parsed):
+            if timestamp is not pd.NaT:
+                record[field] = timestamp.to_pydatetime()
+    
+    return records
+
+
 # Database instance
 db = Database()
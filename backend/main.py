@@ -1,12 +1,22 @@
-from fastapi import FastAPI, HTTPException, Query, BackgroundTasks
+from fastapi import FastAPI, HTTPException, Query, Header, BackgroundTasks, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, HTMLResponse
-from typing import List, Optional
-from datetime import datetime, timedelta
+from fastapi.responses import ORJSONResponse, HTMLResponse, StreamingResponse, Response
+from typing import List, Optional, Tuple
+from datetime import datetime, timedelta, timezone
 import logging
 from contextlib import asynccontextmanager
+from functools import lru_cache
+from bisect import bisect_left
+from email.utils import parsedate_to_datetime
 import asyncio
+import html
 import os
+import re
+import orjson
+import numpy as np
+import pandas as pd
+from arq import create_pool
+from arq.connections import RedisSettings
 
 from config import settings
 from database import db
@@ -18,6 +28,7 @@ from data_processing.validator import DataValidator
 from ml.forecasting_engine import ForecastingEngine
 from scheduler import DataScheduler
 from services.email_service import EmailService
+from services.response_cache import ResponseCache
 from pydantic import BaseModel, EmailStr, Field
 
 # Define subscription models inline
@@ -44,6 +55,148 @@ class EmailPreviewResponse(BaseModel):
     html_content: str
     subject: str
 
+EARTH_RADIUS_KM = 6378.1
+
+# Fields returned by the read endpoints (never `_id` or internal lookup fields)
+CURRENT_PROJECTION = {
+    "_id": 0, "timestamp": 1, "lat": 1, "lon": 1, "pollutant_type": 1,
+    "value": 1, "city": 1, "source": 1, "aqi": 1, "aqi_category": 1
+}
+# Most recent readings considered when picking the latest per pollutant
+CURRENT_SCAN_LIMIT = 400
+MAP_PROJECTION = {
+    "_id": 0, "timestamp": 1, "lat": 1, "lon": 1, "pollutant_type": 1,
+    "value": 1, "city": 1, "source": 1, "aqi": 1, "aqi_category": 1
+}
+FORECAST_PROJECTION = {"_id": 0, "location": 0, "city_lower": 0}
+# Just enough of a reading to track its AQI over time
+READING_PROJECTION = {
+    "_id": 0, "timestamp": 1, "pollutant_type": 1, "value": 1, "aqi": 1, "aqi_category": 1
+}
+HISTORICAL_PROJECTION = {"_id": 0, "location": 0, "city_lower": 0}
+# Rows per flushed /api/historical NDJSON chunk
+NDJSON_CHUNK_SIZE = 256
+
+# Health advice per audience, one row per band:
+# (inclusive upper AQI bound, recommendations, activity_level, mask_needed)
+HEALTH_ADVICE_BANDS = {
+    # Health-sensitive individuals (lower thresholds)
+    "sensitive": (
+        (50, ("Excellent air quality. Perfect for all activities.",), "unrestricted", False),
+        (75, ("Good air quality. Consider limiting prolonged outdoor activities.",), "light_caution", False),
+        (float("inf"), ("Stay indoors. Use air purifiers if available.", "Avoid outdoor exercise."), "restricted", True)
+    ),
+    # General population
+    "general": (
+        (100, ("Air quality is acceptable for outdoor activities.",), "normal", False),
+        (150, ("Limit prolonged outdoor activities.", "Consider wearing a mask outdoors."), "moderate_caution", True),
+        (float("inf"), ("Avoid outdoor activities.", "Stay indoors with windows closed."), "restricted", True)
+    )
+}
+HEALTH_ADVICE_CUTS = {
+    audience: [band[0] for band in bands] for audience, bands in HEALTH_ADVICE_BANDS.items()
+}
+
+@lru_cache(maxsize=1024)
+def city_pattern(city: str) -> str:
+    """Anchored, escaped regex on `city_lower` for a `*` wildcard city name"""
+    return "^" + re.escape(city.strip().lower()).replace(r"\*", ".*") + "$"
+
+def city_filter(city: str) -> dict:
+    """
+    Mongo filter for a city name: indexed exact match on `city_lower`,
+    or an anchored pattern when the name contains a `*` wildcard.
+    
+    Wildcards match the lower-cased field case-sensitively, so the literal
+    prefix before the first `*` bounds a scan of the city_lower index.
+    """
+    if "*" in city:
+        return {"city_lower": {"$regex": city_pattern(city)}}
+    return {"city_lower": city.strip().lower()}
+
+def near_filter(lat: float, lon: float, radius_km: float = 10.0) -> dict:
+    """Mongo 2dsphere filter for points within `radius_km` of (lat, lon)"""
+    return {
+        "location": {
+            "$geoWithin": {"$centerSphere": [[lon, lat], radius_km / EARTH_RADIUS_KM]}
+        }
+    }
+
+def bbox_filter(min_lon: float, min_lat: float, max_lon: float, max_lat: float) -> dict:
+    """Mongo 2dsphere filter for points inside a lon/lat bounding box"""
+    ring = [
+        [min_lon, min_lat], [max_lon, min_lat], [max_lon, max_lat],
+        [min_lon, max_lat], [min_lon, min_lat]
+    ]
+    return {
+        "location": {
+            "$geoWithin": {"$geometry": {"type": "Polygon", "coordinates": [ring]}}
+        }
+    }
+
+def parse_bbox(bbox: str) -> Tuple[float, float, float, float]:
+    """Parse 'min_lon,min_lat,max_lon,max_lat', raising a 400 on bad input"""
+    try:
+        min_lon, min_lat, max_lon, max_lat = (float(part) for part in bbox.split(","))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid bbox format")
+    return min_lon, min_lat, max_lon, max_lat
+
+DEFAULT_US_BBOX_FILTER = bbox_filter(-125, 25, -65, 50)
+
+def normalize_current_params(params: dict) -> dict:
+    """Canonical /api/current cache parameters: ~1 km coordinates"""
+    params = dict(params)
+    if params.get("city"):
+        params["city"] = params["city"].strip()
+    for name in ("lat", "lon"):
+        if params.get(name) is not None:
+            params[name] = round(params[name], 2)
+    if params.get("pollutant"):
+        params["pollutant"] = params["pollutant"].upper()
+    return params
+
+def normalize_map_params(params: dict) -> dict:
+    """Canonical /api/map cache parameters: bbox quantized to 0.01 degrees"""
+    params = dict(params)
+    if params.get("bbox"):
+        params["bbox"] = ",".join(f"{value:.2f}" for value in parse_bbox(params["bbox"]))
+    if params.get("pollutant"):
+        params["pollutant"] = params["pollutant"].upper()
+    return params
+
+def ensure_aqi(records: List[dict]) -> List[dict]:
+    """
+    Fill `aqi`/`aqi_category` in place on readings harmonized before AQI was
+    stored at ingestion; readings that already carry it are left untouched.
+    """
+    missing = [record for record in records if "aqi_category" not in record]
+    if missing:
+        aqis, categories = harmonizer.calculate_aqi_many(
+            [record.get("pollutant_type") for record in missing],
+            [record.get("value") for record in missing]
+        )
+        for record, aqi, category in zip(missing, aqis, categories):
+            record["aqi"] = aqi
+            record["aqi_category"] = category
+    return records
+
+def ndjson_chunk(records: List[dict]) -> bytes:
+    """NDJSON lines for a batch of readings"""
+    return b"\n".join(
+        orjson.dumps(record, default=str) for record in ensure_aqi(records)
+    ) + b"\n"
+
+def parse_datetime_param(value: str, name: str) -> datetime:
+    """Parse an ISO date/datetime query parameter to a naive UTC datetime"""
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid {name}, expected ISO format")
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -65,6 +218,19 @@ async def lifespan(app: FastAPI):
         logger.error(f"Database connection failed: {e}")
         # Continue without database for now (will use demo data)
     
+    # Load the compiled AQI kernel now rather than on the first request
+    harmonizer.calculate_aqi_many(["PM2.5"], [0.0])
+    
+    await response_cache.connect(settings.redis_url)
+    app.state.redis = response_cache.redis
+    
+    # Ingestion job queue shared by all API workers (see worker.py)
+    try:
+        app.state.arq = await create_pool(RedisSettings.from_dsn(settings.redis_url))
+    except Exception as e:
+        logger.warning(f"Job queue unavailable, manual updates will run in-process: {e}")
+        app.state.arq = None
+    
     # Initialize scheduler for automated data collection (with error handling)
     try:
         scheduler = DataScheduler(
@@ -99,9 +265,18 @@ async def lifespan(app: FastAPI):
         if hasattr(app.state, 'scheduler') and app.state.scheduler:
             app.state.scheduler.stop()
             logger.info("Scheduler stopped")
+
+            # Release pooled HTTP connections held by the ingestion clients
+            await app.state.scheduler.tempo_client.close()
+            await app.state.scheduler.ground_client.close()
+            await app.state.scheduler.weather_client.close()
     except Exception as e:
         logger.error(f"Error stopping scheduler: {e}")
     
+    await response_cache.close()
+    if app.state.arq is not None:
+        await app.state.arq.close()
+    
     try:
         await db.close_db()
         logger.info("Database connection closed")
@@ -116,7 +291,8 @@ app = FastAPI(
     title="CleanAirSight API",
     description="Real-time air quality monitoring and forecasting using NASA TEMPO satellite data",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # Add CORS middleware
@@ -128,6 +304,57 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+# Endpoints whose responses only change when harmonized data is refreshed
+FRESHNESS_PATHS = {"/api/current", "/api/map"}
+
+
+async def not_modified_since_refresh(request: Request) -> bool:
+    """
+    True if the client's copy (If-Modified-Since) was generated after the
+    last harmonized data refresh. If-None-Match takes precedence when sent.
+    """
+    if_modified_since = request.headers.get("if-modified-since")
+    if not if_modified_since or "if-none-match" in request.headers:
+        return False
+    try:
+        client_time = parsedate_to_datetime(if_modified_since)
+        refreshed_at = await db.last_refreshed("harmonized_data")
+    except Exception:
+        return False
+    if refreshed_at is None or client_time.tzinfo is None:
+        return False
+    return client_time >= refreshed_at.replace(tzinfo=timezone.utc)
+
+
+@app.middleware("http")
+async def conditional_get(request: Request, call_next):
+    """Answer revalidations of unchanged responses with 304"""
+    if (
+        request.method == "GET"
+        and request.url.path in FRESHNESS_PATHS
+        and await not_modified_since_refresh(request)
+    ):
+        # Skips the handler, cache and database query entirely
+        return Response(
+            status_code=304,
+            headers={"Last-Modified": request.headers["if-modified-since"]}
+        )
+    
+    response = await call_next(request)
+    
+    etag = response.headers.get("etag")
+    if_none_match = request.headers.get("if-none-match")
+    if etag and if_none_match and request.method == "GET":
+        if etag in (tag.strip() for tag in if_none_match.split(",")) or if_none_match.strip() == "*":
+            headers = {
+                name: value for name, value in response.headers.items()
+                if name in ("etag", "cache-control", "last-modified", "x-cache")
+            }
+            return Response(status_code=304, headers=headers)
+    
+    return response
+
 # Initialize components
 harmonizer = DataHarmonizer()
 validator = DataValidator(discrepancy_threshold=settings.discrepancy_threshold)
@@ -136,6 +363,7 @@ email_service = EmailService(
     smtp_server=settings.smtp_server,
     smtp_port=settings.smtp_port
 )
+response_cache = ResponseCache()
 
 
 @app.get("/")
@@ -156,6 +384,7 @@ async def root():
 
 
 @app.get("/api/current")
+@response_cache.cached("current", ttl=60, max_age=30, normalize=normalize_current_params)
 async def get_current_aqi(
     city: Optional[str] = Query(None, description="City name"),
     lat: Optional[float] = Query(None, description="Latitude"),
@@ -172,30 +401,46 @@ async def get_current_aqi(
         
         # Build query based on parameters
         if city:
-            query["city"] = {"$regex": city, "$options": "i"}
+            query.update(city_filter(city))
         
         if lat is not None and lon is not None:
             # Find locations within ~10km radius
-            query["lat"] = {"$gte": lat - 0.1, "$lte": lat + 0.1}
-            query["lon"] = {"$gte": lon - 0.1, "$lte": lon + 0.1}
+            query.update(near_filter(lat, lon))
         
         if pollutant:
             query["pollutant_type"] = pollutant
         
         # Get latest data from last 2 hours
         two_hours_ago = datetime.utcnow() - timedelta(hours=2)
-        query["timestamp"] = {"$gte": two_hours_ago.isoformat()}
+        query["timestamp"] = {"$gte": two_hours_ago}
         
-        # Fetch from database
-        cursor = db.get_db().harmonized_data.find(query).sort("timestamp", -1).limit(100)
-        results = await cursor.to_list(length=100)
+        # Latest record per pollutant, selected server-side
+        pipeline = [
+            {"$match": query},
+            {"$sort": {"timestamp": -1}},
+            # Bounds the in-memory sort to a top-k and the group input
+            {"$limit": CURRENT_SCAN_LIMIT},
+            {"$project": CURRENT_PROJECTION},
+            {
+                "$group": {
+                    "_id": "$pollutant_type",
+                    "doc": {"$first": "$$ROOT"},
+                    "sources": {"$addToSet": "$source"}
+                }
+            },
+            {"$sort": {"doc.timestamp": -1}}
+        ]
+        grouped = await db.get_db().harmonized_data.aggregate(
+            pipeline, allowDiskUse=False
+        ).to_list(length=None)
+        results = [group["doc"] for group in grouped]
         
         if not results:
             # Return demo data if database is empty (for testing)
             logger.warning("No data in database, returning demo data")
             demo_data = [
                 {
-                    "timestamp": datetime.utcnow().isoformat(),
+                    "timestamp": datetime.utcnow(),
                     "city": city or "Los Angeles",
                     "lat": lat or 34.0522,
                     "lon": lon or -118.2437,
@@ -206,36 +451,17 @@ async def get_current_aqi(
                     "source": "Demo"
                 }
             ]
-            return {"success": True, "data": demo_data, "count": len(demo_data), "note": "Demo data - backend is collecting real data"}
-        
-        # Calculate AQI for each result
-        for result in results:
-            aqi_info = harmonizer.calculate_aqi(
-                result.get("pollutant_type"),
-                result.get("value")
-            )
-            result["aqi"] = aqi_info.get("aqi")
-            result["aqi_category"] = aqi_info.get("category")
-            result.pop("_id", None)  # Remove MongoDB ID
+            return ORJSONResponse({"success": True, "data": demo_data, "count": len(demo_data), "note": "Demo data - backend is collecting real data"})
         
-        # Group by pollutant and get latest for each
-        pollutant_latest = {}
-        for result in results:
-            p_type = result.get("pollutant_type")
-            if p_type not in pollutant_latest:
-                pollutant_latest[p_type] = result
+        # AQI is stored at ingestion; only older readings need computing
+        ensure_aqi(results)
         
         # Calculate overall AQI (maximum of all pollutants)
-        overall_aqi = max([r.get("aqi", 0) for r in pollutant_latest.values()])
-        overall_category = harmonizer.calculate_aqi("PM2.5", 0).get("category")
+        overall_aqi = max((r.get("aqi") or 0 for r in results), default=0)
+        overall_category = harmonizer.aqi_category(overall_aqi)
         
-        for aqi_val, category in [(50, "Good"), (100, "Moderate"), (150, "Unhealthy for Sensitive Groups"), 
-                                    (200, "Unhealthy"), (300, "Very Unhealthy"), (500, "Hazardous")]:
-            if overall_aqi <= aqi_val:
-                overall_category = category
-                break
-        
-        return {
+        # Rendered directly with orjson, skipping jsonable_encoder
+        return ORJSONResponse({
             "location": {
                 "city": city or results[0].get("city", "Unknown"),
                 "lat": lat or results[0].get("lat"),
@@ -244,9 +470,11 @@ async def get_current_aqi(
             "timestamp": results[0].get("timestamp"),
             "overall_aqi": overall_aqi,
             "overall_category": overall_category,
-            "pollutants": list(pollutant_latest.values()),
-            "data_sources": list(set([r.get("source") for r in results]))
-        }
+            "pollutants": results,
+            "data_sources": list({
+                source for group in grouped for source in group["sources"] if source
+            })
+        })
         
     except HTTPException:
         raise
@@ -256,6 +484,7 @@ async def get_current_aqi(
 
 
 @app.get("/api/forecast")
+@response_cache.cached("forecast", ttl=600, max_age=900)
 async def get_forecast(
     city: Optional[str] = Query(None, description="City name"),
     lat: Optional[float] = Query(None, description="Latitude"),
@@ -271,24 +500,20 @@ async def get_forecast(
         query = {}
         
         if city:
-            query["city"] = {"$regex": city, "$options": "i"}
+            query.update(city_filter(city))
         
         if lat is not None and lon is not None:
-            query["lat"] = {"$gte": lat - 0.1, "$lte": lat + 0.1}
-            query["lon"] = {"$gte": lon - 0.1, "$lte": lon + 0.1}
+            query.update(near_filter(lat, lon))
         
         # Check if we have recent forecasts
         one_hour_ago = datetime.utcnow() - timedelta(hours=1)
-        query["generated_at"] = {"$gte": one_hour_ago.isoformat()}
+        query["generated_at"] = {"$gte": one_hour_ago}
         
-        cursor = db.get_db().forecasts.find(query).sort("timestamp", 1).limit(hours * 10)
+        cursor = db.get_db().forecasts.find(query, FORECAST_PROJECTION).sort("timestamp", 1).limit(hours * 10)
         cached_forecasts = await cursor.to_list(length=hours * 10)
         
         if cached_forecasts:
             # Return cached forecasts
-            for forecast in cached_forecasts:
-                forecast.pop("_id", None)
-            
             return {
                 "location": {
                     "city": city or cached_forecasts[0].get("city", "Unknown"),
@@ -318,6 +543,7 @@ async def get_forecast(
 
 
 @app.get("/api/map")
+@response_cache.cached("map", ttl=60, max_age=60, normalize=normalize_map_params)
 async def get_map_data(
     bbox: Optional[str] = Query(
         None, 
@@ -333,38 +559,25 @@ async def get_map_data(
     try:
         query = {}
         
-        # Parse bounding box
-        if bbox:
-            try:
-                min_lon, min_lat, max_lon, max_lat = map(float, bbox.split(","))
-                query["lat"] = {"$gte": min_lat, "$lte": max_lat}
-                query["lon"] = {"$gte": min_lon, "$lte": max_lon}
-            except:
-                raise HTTPException(status_code=400, detail="Invalid bbox format")
-        else:
-            # Default to continental US
-            query["lat"] = {"$gte": 25, "$lte": 50}
-            query["lon"] = {"$gte": -125, "$lte": -65}
+        # Parse bounding box (default to continental US)
+        query.update(bbox_filter(*parse_bbox(bbox)) if bbox else DEFAULT_US_BBOX_FILTER)
         
         if pollutant:
             query["pollutant_type"] = pollutant
         
         # Get recent data (last hour)
         one_hour_ago = datetime.utcnow() - timedelta(hours=1)
-        query["timestamp"] = {"$gte": one_hour_ago.isoformat()}
+        query["timestamp"] = {"$gte": one_hour_ago}
         
-        cursor = db.get_db().harmonized_data.find(query).limit(5000)
+        cursor = db.get_db().harmonized_data.find(query, MAP_PROJECTION, batch_size=1000).limit(5000)
         results = await cursor.to_list(length=5000)
         
+        # AQI is stored at ingestion; only older readings need computing
+        ensure_aqi(results)
+        
         # Convert to GeoJSON format
-        features = []
-        for result in results:
-            aqi_info = harmonizer.calculate_aqi(
-                result.get("pollutant_type"),
-                result.get("value")
-            )
-            
-            features.append({
+        features = [
+            {
                 "type": "Feature",
                 "geometry": {
                     "type": "Point",
@@ -373,25 +586,28 @@ async def get_map_data(
                 "properties": {
                     "pollutant_type": result.get("pollutant_type"),
                     "value": result.get("value"),
-                    "aqi": aqi_info.get("aqi"),
-                    "category": aqi_info.get("category"),
+                    "aqi": result["aqi"],
+                    "category": result["aqi_category"],
                     "timestamp": result.get("timestamp"),
                     "source": result.get("source"),
                     "city": result.get("city")
                 }
-            })
+            }
+            for result in results
+        ]
         
         geojson = {
             "type": "FeatureCollection",
             "features": features,
             "metadata": {
-                "generated_at": datetime.utcnow().isoformat(),
+                "generated_at": datetime.utcnow(),
                 "count": len(features),
                 "bbox": bbox
             }
         }
         
-        return geojson
+        # Rendered directly with orjson, skipping jsonable_encoder
+        return ORJSONResponse(geojson)
         
     except HTTPException:
         raise
@@ -408,20 +624,23 @@ async def get_historical_data(
     pollutant: Optional[str] = Query(None, description="Pollutant type"),
     start_date: Optional[str] = Query(None, description="Start date (ISO format)"),
     end_date: Optional[str] = Query(None, description="End date (ISO format)"),
-    limit: int = Query(1000, description="Maximum number of records", le=10000)
+    limit: int = Query(1000, description="Maximum number of records", le=10000),
+    accept: Optional[str] = Header(None)
 ):
     """
     Get historical air quality data.
+    
+    Clients sending `Accept: application/x-ndjson` get one JSON record per
+    line, streamed from the cursor instead of a single buffered document.
     """
     try:
         query = {}
         
         if city:
-            query["city"] = {"$regex": city, "$options": "i"}
+            query.update(city_filter(city))
         
         if lat is not None and lon is not None:
-            query["lat"] = {"$gte": lat - 0.1, "$lte": lat + 0.1}
-            query["lon"] = {"$gte": lon - 0.1, "$lte": lon + 0.1}
+            query.update(near_filter(lat, lon))
         
         if pollutant:
             query["pollutant_type"] = pollutant
@@ -430,33 +649,44 @@ async def get_historical_data(
         if start_date or end_date:
             query["timestamp"] = {}
             if start_date:
-                query["timestamp"]["$gte"] = start_date
+                query["timestamp"]["$gte"] = parse_datetime_param(start_date, "start_date")
             if end_date:
-                query["timestamp"]["$lte"] = end_date
-        
-        cursor = db.get_db().harmonized_data.find(query).sort("timestamp", -1).limit(limit)
-        results = await cursor.to_list(length=limit)
+                query["timestamp"]["$lte"] = parse_datetime_param(end_date, "end_date")
+        
+        cursor = db.get_db().harmonized_data.find(
+            query, HISTORICAL_PROJECTION, batch_size=1000
+        ).sort("timestamp", -1).limit(limit)
+        
+        if accept and "application/x-ndjson" in accept:
+            async def stream_records():
+                # AQI is computed per chunk of rows, each chunk flushed as it completes
+                chunk = []
+                async for result in cursor:
+                    chunk.append(result)
+                    if len(chunk) == NDJSON_CHUNK_SIZE:
+                        yield ndjson_chunk(chunk)
+                        chunk = []
+                if chunk:
+                    yield ndjson_chunk(chunk)
+            
+            return StreamingResponse(stream_records(), media_type="application/x-ndjson")
         
-        # Clean up results
-        for result in results:
-            result.pop("_id", None)
-            aqi_info = harmonizer.calculate_aqi(
-                result.get("pollutant_type"),
-                result.get("value")
-            )
-            result["aqi"] = aqi_info.get("aqi")
+        results = ensure_aqi(await cursor.to_list(length=limit))
         
         return {
             "count": len(results),
             "data": results
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching historical data: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.get("/api/validation")
+@response_cache.cached("validation", ttl=300, max_age=60)
 async def get_validation_report():
     """
     Get data validation and quality report.
@@ -468,8 +698,8 @@ async def get_validation_report():
         one_day_ago = datetime.utcnow() - timedelta(days=1)
         
         cursor = db.get_db().validation_results.find({
-            "timestamp": {"$gte": one_day_ago.isoformat()}
-        }).limit(1000)
+            "timestamp": {"$gte": one_day_ago}
+        }, {"_id": 0}).limit(1000)
         
         validation_results = await cursor.to_list(length=1000)
         
@@ -479,10 +709,6 @@ async def get_validation_report():
                 "report": {}
             }
         
-        # Clean up results
-        for result in validation_results:
-            result.pop("_id", None)
-        
         # Generate quality report
         report = validator.generate_quality_report(validation_results)
         
@@ -500,9 +726,24 @@ async def get_validation_report():
 async def trigger_data_update(background_tasks: BackgroundTasks):
     """
     Manually trigger data collection and processing.
+    
+    The run is queued for the ARQ worker under a per-minute job id, so
+    repeated triggers across API workers collapse into one collection.
+    Without a job queue it falls back to an in-process background task.
     """
     try:
-        background_tasks.add_task(run_data_collection)
+        if app.state.arq is not None:
+            minute_bucket = datetime.utcnow().strftime("%Y%m%d%H%M")
+            job = await app.state.arq.enqueue_job(
+                "run_data_collection",
+                _job_id=f"ingest-{minute_bucket}"
+            )
+            return {
+                "status": "queued" if job is not None else "already_queued",
+                "message": "Data collection queued for the ingestion worker"
+            }
+        
+        background_tasks.add_task(run_data_collection, app.state.scheduler)
         return {
             "status": "triggered",
             "message": "Data collection started in background"
@@ -512,13 +753,21 @@ async def trigger_data_update(background_tasks: BackgroundTasks):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-async def run_data_collection():
+async def run_data_collection(scheduler: Optional[DataScheduler]):
     """Background task to collect and process data"""
     try:
         logger.info("Starting manual data collection...")
         
-        # This would be called by the scheduler
-        # Implementation would fetch data from all sources
+        if scheduler is None:
+            logger.warning("Scheduler not initialized, skipping data collection")
+            return
+        
+        # All sources fetched concurrently, then processed together
+        await scheduler.collect_all_data()
+        await scheduler.harmonize_and_validate()
+        
+        # Drop cached responses so clients see the fresh data
+        await response_cache.invalidate()
         
         logger.info("Data collection completed")
     except Exception as e:
@@ -528,63 +777,53 @@ async def run_data_collection():
 # Email Alert Subscription Endpoints
 
 @app.post("/api/subscribe", response_model=SubscriptionResponse)
-async def subscribe_to_alerts(subscription: SubscriptionRequest):
+async def subscribe_to_alerts(subscription: SubscriptionRequest, background_tasks: BackgroundTasks):
     """Subscribe to daily AQI email alerts"""
     try:
-        # Check if subscriber already exists
-        existing_subscriber = await db.get_db().subscribers.find_one({"email": subscription.email})
+        now = datetime.utcnow()
         
-        if existing_subscriber:
-            # Update existing subscription
-            await db.get_db().subscribers.update_one(
-                {"email": subscription.email},
-                {
-                    "$set": {
-                        "location": {
-                            "city": subscription.city,
-                            "lat": subscription.lat,
-                            "lon": subscription.lon
-                        },
-                        "preferences": {
-                            "alert_threshold": subscription.alert_threshold,
-                            "send_time": subscription.send_time,
-                            "frequency": subscription.frequency
-                        },
-                        "subscription_status": "active",
-                        "updated_at": datetime.utcnow()
-                    }
-                }
-            )
-            message = f"Updated your subscription for {subscription.city}"
-        else:
-            # Create new subscription
-            subscriber_doc = {
-                "email": subscription.email,
-                "location": {
-                    "city": subscription.city,
-                    "lat": subscription.lat,
-                    "lon": subscription.lon
-                },
-                "preferences": {
-                    "alert_threshold": subscription.alert_threshold,
-                    "send_time": subscription.send_time,
-                    "frequency": subscription.frequency
+        # Create or update the subscription in one round-trip (email is unique)
+        result = await db.get_db().subscribers.update_one(
+            {"email": subscription.email},
+            {
+                "$set": {
+                    "location": {
+                        "city": subscription.city,
+                        "lat": subscription.lat,
+                        "lon": subscription.lon
+                    },
+                    "preferences": {
+                        "alert_threshold": subscription.alert_threshold,
+                        "send_time": subscription.send_time,
+                        "frequency": subscription.frequency
+                    },
+                    "subscription_status": "active",
+                    "updated_at": now
                 },
-                "subscription_status": "active",
-                "created_at": datetime.utcnow(),
-                "last_sent": None
-            }
-            
-            result = await db.get_db().subscribers.insert_one(subscriber_doc)
+                "$setOnInsert": {
+                    "created_at": now,
+                    "last_sent": None
+                }
+            },
+            upsert=True
+        )
+        
+        subscriber_id: Optional[str] = None
+        if result.upserted_id is not None:
+            subscriber_id = str(result.upserted_id)
             message = f"Successfully subscribed to AQI alerts for {subscription.city}"
+        else:
+            message = f"Updated your subscription for {subscription.city}"
         
-        # Send confirmation email
-        await email_service.send_confirmation_email(subscription.email, subscription.city)
+        # Send confirmation email after the response; delivery failures are logged
+        background_tasks.add_task(
+            email_service.send_confirmation_email, subscription.email, subscription.city
+        )
         
         return SubscriptionResponse(
             success=True,
             message=message,
-            subscriber_id=str(result.inserted_id) if 'result' in locals() else None
+            subscriber_id=subscriber_id
         )
         
     except Exception as e:
@@ -650,6 +889,34 @@ async def preview_alert_email(email: str):
         raise HTTPException(status_code=500, detail=f"Failed to generate preview: {str(e)}")
 
 
+# Static confirmation page, built once rather than formatted per request
+UNSUBSCRIBE_PAGE_HTML = """
+<!DOCTYPE html>
+<html>
+<head>
+    <title>Unsubscribed - CleanAirSight</title>
+    <style>
+        body { font-family: 'Segoe UI', Arial, sans-serif; max-width: 600px; margin: 50px auto; padding: 20px; text-align: center; }
+        .container { background: white; border-radius: 12px; padding: 40px; box-shadow: 0 4px 12px rgba(0,0,0,0.1); }
+        .success { color: #10b981; font-size: 48px; margin-bottom: 20px; }
+        h1 { color: #1e40af; margin-bottom: 20px; }
+        p { color: #6b7280; line-height: 1.6; }
+        .button { display: inline-block; background: #3b82f6; color: white; padding: 12px 24px; border-radius: 8px; text-decoration: none; margin-top: 20px; }
+    </style>
+</head>
+<body>
+    <div class="container">
+        <div class="success">✅</div>
+        <h1>Successfully Unsubscribed</h1>
+        <p>You have been unsubscribed from CleanAirSight AQI email alerts.</p>
+        <p>We're sorry to see you go! If you change your mind, you can always subscribe again on our website.</p>
+        <a href="http://localhost:3000" class="button">Return to CleanAirSight</a>
+    </div>
+</body>
+</html>
+"""
+
+
 @app.get("/unsubscribe/{email}")
 async def unsubscribe_web_page(email: str):
     """Web page for unsubscribing from email alerts"""
@@ -660,38 +927,12 @@ async def unsubscribe_web_page(email: str):
             {"$set": {"subscription_status": "cancelled", "cancelled_at": datetime.utcnow()}}
         )
         
-        html_content = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <title>Unsubscribed - CleanAirSight</title>
-            <style>
-                body {{ font-family: 'Segoe UI', Arial, sans-serif; max-width: 600px; margin: 50px auto; padding: 20px; text-align: center; }}
-                .container {{ background: white; border-radius: 12px; padding: 40px; box-shadow: 0 4px 12px rgba(0,0,0,0.1); }}
-                .success {{ color: #10b981; font-size: 48px; margin-bottom: 20px; }}
-                h1 {{ color: #1e40af; margin-bottom: 20px; }}
-                p {{ color: #6b7280; line-height: 1.6; }}
-                .button {{ display: inline-block; background: #3b82f6; color: white; padding: 12px 24px; border-radius: 8px; text-decoration: none; margin-top: 20px; }}
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <div class="success">✅</div>
-                <h1>Successfully Unsubscribed</h1>
-                <p>You have been unsubscribed from CleanAirSight AQI email alerts.</p>
-                <p>We're sorry to see you go! If you change your mind, you can always subscribe again on our website.</p>
-                <a href="http://localhost:3000" class="button">Return to CleanAirSight</a>
-            </div>
-        </body>
-        </html>
-        """
-        
-        return HTMLResponse(content=html_content)
+        return HTMLResponse(content=UNSUBSCRIBE_PAGE_HTML)
         
     except Exception as e:
         logger.error(f"Error in web unsubscribe: {e}")
         return HTMLResponse(
-            content=f"<h1>Error</h1><p>Failed to unsubscribe: {str(e)}</p>",
+            content=f"<h1>Error</h1><p>Failed to unsubscribe: {html.escape(str(e))}</p>",
             status_code=500
         )
 
@@ -699,6 +940,7 @@ async def unsubscribe_web_page(email: str):
 # Personalized Dashboard API Endpoints
 
 @app.get("/api/personalized/hotspots")
+@response_cache.cached("hotspots", ttl=60, max_age=60)
 async def get_pollution_hotspots(
     threshold: int = Query(100, description="AQI threshold for hotspots"),
     limit: int = Query(10, description="Maximum number of hotspots")
@@ -711,7 +953,7 @@ async def get_pollution_hotspots(
         pipeline = [
             {
                 "$match": {
-                    "timestamp": {"$gte": one_hour_ago.isoformat()}
+                    "timestamp": {"$gte": one_hour_ago}
                 }
             },
             {
@@ -727,28 +969,29 @@ async def get_pollution_hotspots(
             {"$limit": limit}
         ]
         
-        hotspots = []
-        cursor = db.get_db().harmonized_data.aggregate(pipeline)
+        results = await db.get_db().harmonized_data.aggregate(pipeline).to_list(length=limit)
         
-        async for result in cursor:
-            aqi_info = harmonizer.calculate_aqi(
-                result.get("pollutant_type"),
-                result.get("max_value")
-            )
-            
-            if aqi_info.get("aqi", 0) >= threshold:
-                hotspots.append({
-                    "location": {
-                        "city": result["_id"].get("city"),
-                        "lat": result["_id"].get("lat"),
-                        "lon": result["_id"].get("lon")
-                    },
-                    "aqi": aqi_info.get("aqi"),
-                    "category": aqi_info.get("category"),
-                    "pollutant": result.get("pollutant_type"),
-                    "value": result.get("max_value"),
-                    "timestamp": result.get("latest_timestamp")
-                })
+        aqis, categories = harmonizer.calculate_aqi_many(
+            [result.get("pollutant_type") for result in results],
+            [result.get("max_value") for result in results]
+        )
+        
+        hotspots = [
+            {
+                "location": {
+                    "city": result["_id"].get("city"),
+                    "lat": result["_id"].get("lat"),
+                    "lon": result["_id"].get("lon")
+                },
+                "aqi": aqi,
+                "category": category,
+                "pollutant": result.get("pollutant_type"),
+                "value": result.get("max_value"),
+                "timestamp": result.get("latest_timestamp")
+            }
+            for result, aqi, category in zip(results, aqis, categories)
+            if aqi is not None and aqi >= threshold
+        ]
         
         return {"hotspots": hotspots, "threshold": threshold}
         
@@ -764,41 +1007,22 @@ async def get_health_advice(
 ):
     """Get personalized health advice based on AQI and user type"""
     try:
-        advice = {
-            "aqi": aqi,
-            "user_type": user_type,
-            "recommendations": [],
-            "mask_needed": False,
-            "activity_level": "normal"
-        }
-        
-        if user_type == "sensitive":
-            # Health-sensitive individuals (lower thresholds)
-            if aqi <= 50:
-                advice["recommendations"] = ["Excellent air quality. Perfect for all activities."]
-                advice["activity_level"] = "unrestricted"
-            elif aqi <= 75:
-                advice["recommendations"] = ["Good air quality. Consider limiting prolonged outdoor activities."]
-                advice["activity_level"] = "light_caution"
-            else:
-                advice["recommendations"] = ["Stay indoors. Use air purifiers if available.", "Avoid outdoor exercise."]
-                advice["mask_needed"] = True
-                advice["activity_level"] = "restricted"
-        else:
-            # General population
-            if aqi <= 100:
-                advice["recommendations"] = ["Air quality is acceptable for outdoor activities."]
-                advice["activity_level"] = "normal"
-            elif aqi <= 150:
-                advice["recommendations"] = ["Limit prolonged outdoor activities.", "Consider wearing a mask outdoors."]
-                advice["activity_level"] = "moderate_caution"
-                advice["mask_needed"] = True
-            else:
-                advice["recommendations"] = ["Avoid outdoor activities.", "Stay indoors with windows closed."]
-                advice["activity_level"] = "restricted"
-                advice["mask_needed"] = True
+        # Pure function of (aqi, user_type): one band lookup, cacheable by clients
+        audience = "sensitive" if user_type == "sensitive" else "general"
+        _, recommendations, activity_level, mask_needed = HEALTH_ADVICE_BANDS[audience][
+            bisect_left(HEALTH_ADVICE_CUTS[audience], aqi)
+        ]
         
-        return advice
+        return ORJSONResponse(
+            {
+                "aqi": aqi,
+                "user_type": user_type,
+                "recommendations": recommendations,
+                "mask_needed": mask_needed,
+                "activity_level": activity_level
+            },
+            headers={"Cache-Control": "public, max-age=86400"}
+        )
         
     except Exception as e:
         logger.error(f"Error generating health advice: {e}")
@@ -817,31 +1041,29 @@ async def get_route_air_quality(
             lat, lon = map(float, coord_pair.split(','))
             coords.append({"lat": lat, "lon": lon})
         
-        route_quality = []
+        two_hours_ago = datetime.utcnow() - timedelta(hours=2)
         
-        for point in coords:
+        async def nearby_readings(point: dict) -> List[dict]:
             # Find nearby air quality data (within 5km)
             query = {
-                "lat": {"$gte": point["lat"] - 0.05, "$lte": point["lat"] + 0.05},
-                "lon": {"$gte": point["lon"] - 0.05, "$lte": point["lon"] + 0.05},
-                "timestamp": {"$gte": (datetime.utcnow() - timedelta(hours=2)).isoformat()}
+                **near_filter(point["lat"], point["lon"], radius_km=5.0),
+                "timestamp": {"$gte": two_hours_ago}
             }
-            
-            cursor = db.get_db().harmonized_data.find(query).sort("timestamp", -1).limit(5)
-            results = await cursor.to_list(length=5)
-            
+            cursor = db.get_db().harmonized_data.find(
+                query, READING_PROJECTION
+            ).sort("timestamp", -1).limit(5)
+            return await cursor.to_list(length=5)
+        
+        # Query all route points concurrently rather than one round-trip at a time
+        point_results = await asyncio.gather(*(nearby_readings(point) for point in coords))
+        
+        route_quality = []
+        
+        for point, results in zip(coords, point_results):
             if results:
                 # Calculate average AQI for this point
-                total_aqi = 0
-                count = 0
-                
-                for result in results:
-                    aqi_info = harmonizer.calculate_aqi(
-                        result.get("pollutant_type"),
-                        result.get("value")
-                    )
-                    total_aqi += aqi_info.get("aqi", 0)
-                    count += 1
+                total_aqi = sum(result["aqi"] or 0 for result in ensure_aqi(results))
+                count = len(results)
                 
                 avg_aqi = total_aqi / count if count > 0 else 0
                 
@@ -894,7 +1116,7 @@ async def get_city_leaderboard(limit: int = Query(10, description="Number of cit
         pipeline = [
             {
                 "$match": {
-                    "timestamp": {"$gte": one_day_ago.isoformat()},
+                    "timestamp": {"$gte": one_day_ago},
                     "city": {"$exists": True, "$ne": None}
                 }
             },
@@ -911,31 +1133,28 @@ async def get_city_leaderboard(limit: int = Query(10, description="Number of cit
             {"$limit": limit}
         ]
         
-        leaderboard = []
-        cursor = db.get_db().harmonized_data.aggregate(pipeline)
+        results = await db.get_db().harmonized_data.aggregate(pipeline).to_list(length=limit)
         
-        rank = 1
-        async for result in cursor:
-            aqi_info = harmonizer.calculate_aqi(
-                result.get("pollutant_type"),
-                result.get("avg_value")
-            )
-            
-            # Calculate trend (simplified - would need time series analysis)
-            trend = "stable"  # In real implementation, compare with previous period
-            
-            leaderboard.append({
+        aqis, categories = harmonizer.calculate_aqi_many(
+            [result.get("pollutant_type") for result in results],
+            [result.get("avg_value") for result in results]
+        )
+        
+        leaderboard = [
+            {
                 "rank": rank,
                 "city": result["_id"],
-                "aqi": round(aqi_info.get("aqi", 0)),
-                "category": aqi_info.get("category"),
-                "trend": trend,
+                "aqi": aqi or 0,
+                "category": category,
+                # Calculate trend (simplified - would need time series analysis)
+                "trend": "stable",  # In real implementation, compare with previous period
                 "data_points": result.get("data_points"),
-                "score": max(0, 100 - aqi_info.get("aqi", 0))  # Score out of 100
-            })
-            rank += 1
+                "score": max(0, 100 - (aqi or 0))  # Score out of 100
+            }
+            for rank, (result, aqi, category) in enumerate(zip(results, aqis, categories), start=1)
+        ]
         
-        return {"leaderboard": leaderboard, "generated_at": datetime.utcnow().isoformat()}
+        return {"leaderboard": leaderboard, "generated_at": datetime.utcnow()}
         
     except Exception as e:
         logger.error(f"Error generating city leaderboard: {e}")
@@ -963,7 +1182,7 @@ async def submit_citizen_report(
             },
             "description": description,
             "severity": severity,
-            "timestamp": datetime.utcnow().isoformat(),
+            "timestamp": datetime.utcnow(),
             "status": "pending",
             "votes": 0,
             "verified": False
@@ -994,40 +1213,43 @@ async def get_business_impact_analysis(
         start_date = datetime.utcnow() - timedelta(days=days)
         
         query = {
-            "lat": {"$gte": business_lat - 0.01, "$lte": business_lat + 0.01},
-            "lon": {"$gte": business_lon - 0.01, "$lte": business_lon + 0.01},
-            "timestamp": {"$gte": start_date.isoformat()}
+            **near_filter(business_lat, business_lon, radius_km=1.0),
+            "timestamp": {"$gte": start_date}
         }
         
-        cursor = db.get_db().harmonized_data.find(query).sort("timestamp", 1)
-        results = await cursor.to_list(length=10000)
+        # Peak concentration per day and pollutant, reduced server-side; AQI is
+        # monotonic in concentration, so the peak value gives the peak AQI
+        pipeline = [
+            {"$match": query},
+            {
+                "$group": {
+                    "_id": {
+                        # UTC day number (epoch milliseconds // one day), no string formatting
+                        "day": {"$floor": {"$divide": [{"$toLong": "$timestamp"}, 86_400_000]}},
+                        "pollutant_type": "$pollutant_type"
+                    },
+                    "max_value": {"$max": "$value"},
+                    "count": {"$sum": 1}
+                }
+            }
+        ]
+        grouped = await db.get_db().harmonized_data.aggregate(pipeline).to_list(length=None)
         
-        # Calculate business impact metrics
-        high_aqi_days = 0
+        # Calculate business impact metrics from the worst pollutant of each day
         total_days = days
-        estimated_costs = 0
-        
-        daily_aqi = {}
-        for result in results:
-            date = result.get("timestamp", "")[:10]  # Get date part
-            aqi_info = harmonizer.calculate_aqi(
-                result.get("pollutant_type"),
-                result.get("value")
-            )
-            aqi_value = aqi_info.get("aqi", 0)
-            
-            if date not in daily_aqi:
-                daily_aqi[date] = []
-            daily_aqi[date].append(aqi_value)
-        
-        # Calculate impact
-        for date, aqi_values in daily_aqi.items():
-            max_aqi = max(aqi_values)
-            if max_aqi > 150:  # Unhealthy levels
-                high_aqi_days += 1
-                estimated_costs += 1000  # $1000 per high AQI day (simplified)
-            elif max_aqi > 100:  # Moderate levels
-                estimated_costs += 500   # $500 per moderate AQI day
+        aqis, _ = harmonizer.calculate_aqi_many(
+            [group["_id"].get("pollutant_type") for group in grouped],
+            [group.get("max_value") for group in grouped]
+        )
+        daily = pd.DataFrame({
+            "day": [group["_id"].get("day") for group in grouped],
+            "aqi": pd.to_numeric(aqis, errors="coerce")
+        })
+        daily_max = daily["aqi"].fillna(0).groupby(daily["day"]).max().to_numpy()
+        
+        high_aqi_days = int((daily_max > 150).sum())  # Unhealthy levels
+        # $1000 per high AQI day, $500 per moderate AQI day (simplified)
+        estimated_costs = int(np.where(daily_max > 150, 1000, np.where(daily_max > 100, 500, 0)).sum())
         
         risk_score = min(100, (high_aqi_days / total_days) * 100 + (estimated_costs / 1000))
         
@@ -1038,7 +1260,7 @@ async def get_business_impact_analysis(
                 "high_aqi_days": high_aqi_days,
                 "estimated_cost_impact": estimated_costs,
                 "risk_score": round(risk_score, 1),
-                "data_points": len(results)
+                "data_points": sum(group["count"] for group in grouped)
             },
             "recommendations": [
                 "Install air filtration systems" if risk_score > 70 else "Monitor air quality trends",
@@ -1096,7 +1318,7 @@ async def get_nasa_air_quality(
         # Compile comprehensive response
         response = {
             "success": True,
-            "timestamp": datetime.utcnow().isoformat(),
+            "timestamp": datetime.utcnow(),
             "location": {"lat": lat, "lon": lon},
             "airQuality": air_quality_data,
             "weather": weather_data,
@@ -1146,7 +1368,7 @@ async def get_nasa_services_status():
         
         response = {
             "success": True,
-            "timestamp": datetime.utcnow().isoformat(),
+            "timestamp": datetime.utcnow(),
             "services": status,
             "configuration": config_status,
             "overall_status": "OPERATIONAL" if status["integration_available"] else "FALLBACK_MODE",
@@ -1235,14 +1457,14 @@ async def health_check():
         
         return {
             "status": "healthy",
-            "timestamp": datetime.utcnow().isoformat(),
+            "timestamp": datetime.utcnow(),
             "database": "connected",
             "nasa_integration": nasa_status,
             "version": "3.0.0 - NASA TEMPO Integration",
             "features": ["nasa_tempo", "planetary_computer", "azure_ml", "enhanced_weather"]
         }
     except Exception as e:
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=503,
             content={
                 "status": "unhealthy",
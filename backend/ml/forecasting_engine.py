@@ -4,14 +4,21 @@ import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple
+import os
 import joblib
+from joblib import Parallel, delayed
 from pathlib import Path
+from cachetools import LRUCache
 
 from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_squared_error, r2_score, mean_absolute_error
 from xgboost import XGBRegressor
 
+# Cyclical hour encoding, looked up during recursive forecasting
+HOUR_SIN = np.sin(2 * np.pi * np.arange(24) / 24)
+HOUR_COS = np.cos(2 * np.pi * np.arange(24) / 24)
+
 class ForecastingEngine:
     """ML-based air quality forecasting"""
     
@@ -20,57 +27,98 @@ class ForecastingEngine:
         self.model_dir.mkdir(exist_ok=True)
         self.models = {}
         self.feature_columns = []
+        # Feature columns each pollutant's model was trained on
+        self.model_features: Dict[str, List[str]] = {}
+        # Location forecasts keyed by quantized location and the data they were built from
+        self._forecast_cache: LRUCache = LRUCache(maxsize=256)
         
     def prepare_features(self, df: pd.DataFrame) -> pd.DataFrame:
         """Engineer features for ML models"""
-        df = df.copy()
-        df['timestamp'] = pd.to_datetime(df['timestamp'])
-        df = df.sort_values('timestamp')
+        # Accepts records or a frame; the caller's frame is never modified
+        df = pd.DataFrame(df)
+        df = df.assign(timestamp=pd.to_datetime(df['timestamp'])).sort_values('timestamp')
+        
+        # Engineered columns are built as contiguous float64 arrays and
+        # attached in one step
+        timestamps = df['timestamp'].dt
+        features = {}
         
         # Time-based features
-        df['hour'] = df['timestamp'].dt.hour
-        df['day_of_week'] = df['timestamp'].dt.dayofweek
-        df['month'] = df['timestamp'].dt.month
-        df['day_of_year'] = df['timestamp'].dt.dayofyear
+        hour = timestamps.hour.to_numpy(dtype=np.float64)
+        day_of_week = timestamps.dayofweek.to_numpy(dtype=np.float64)
+        month = timestamps.month.to_numpy(dtype=np.float64)
+        features['hour'] = hour
+        features['day_of_week'] = day_of_week
+        features['month'] = month
+        features['day_of_year'] = timestamps.dayofyear.to_numpy(dtype=np.float64)
         
         # Cyclical encoding for time features
-        df['hour_sin'] = np.sin(2 * np.pi * df['hour'] / 24)
-        df['hour_cos'] = np.cos(2 * np.pi * df['hour'] / 24)
-        df['day_sin'] = np.sin(2 * np.pi * df['day_of_week'] / 7)
-        df['day_cos'] = np.cos(2 * np.pi * df['day_of_week'] / 7)
-        df['month_sin'] = np.sin(2 * np.pi * df['month'] / 12)
-        df['month_cos'] = np.cos(2 * np.pi * df['month'] / 12)
+        features['hour_sin'] = np.sin(2 * np.pi * hour / 24)
+        features['hour_cos'] = np.cos(2 * np.pi * hour / 24)
+        features['day_sin'] = np.sin(2 * np.pi * day_of_week / 7)
+        features['day_cos'] = np.cos(2 * np.pi * day_of_week / 7)
+        features['month_sin'] = np.sin(2 * np.pi * month / 12)
+        features['month_cos'] = np.cos(2 * np.pi * month / 12)
         
         # Spatial features
         if 'lat' in df.columns and 'lon' in df.columns:
-            df['lat'] = df['lat'].fillna(0)
-            df['lon'] = df['lon'].fillna(0)
+            features['lat'] = df['lat'].fillna(0).to_numpy()
+            features['lon'] = df['lon'].fillna(0).to_numpy()
         
         # Weather features
         weather_cols = ['temperature', 'humidity', 'wind_speed', 'pressure']
         for col in weather_cols:
             if col in df.columns:
-                df[col] = df[col].fillna(df[col].median())
+                features[col] = df[col].fillna(df[col].median()).to_numpy()
         
-        # Lag features (previous values)
-        for lag in [1, 2, 3, 6, 12, 24]:
-            if 'value' in df.columns:
-                df[f'lag_{lag}'] = df['value'].shift(lag)
-        
-        # Rolling statistics
         if 'value' in df.columns:
-            df['rolling_mean_3'] = df['value'].rolling(window=3, min_periods=1).mean()
-            df['rolling_mean_6'] = df['value'].rolling(window=6, min_periods=1).mean()
-            df['rolling_mean_12'] = df['value'].rolling(window=12, min_periods=1).mean()
-            df['rolling_mean_24'] = df['value'].rolling(window=24, min_periods=1).mean()
-            df['rolling_std_3'] = df['value'].rolling(window=3, min_periods=1).std()
-            df['rolling_std_12'] = df['value'].rolling(window=12, min_periods=1).std()
+            values = df['value'].to_numpy(dtype=np.float64)
+            
+            # Lag features (previous values)
+            for lag in [1, 2, 3, 6, 12, 24]:
+                lagged = np.full(len(values), np.nan)
+                if lag < len(values):
+                    lagged[lag:] = values[:-lag]
+                features[f'lag_{lag}'] = lagged
+            
+            # Rolling statistics
+            for window in [3, 6, 12, 24]:
+                mean, std = self._rolling_stats(values, window)
+                features[f'rolling_mean_{window}'] = mean
+                if window in (3, 12):
+                    features[f'rolling_std_{window}'] = std
+        
+        df = df.assign(**{name: pd.Series(column, index=df.index) for name, column in features.items()})
         
         # Drop rows with NaN in lag features (first few rows)
         df = df.dropna(subset=[f'lag_{i}' for i in [1, 2, 3]])
         
         return df
     
+    @staticmethod
+    def _rolling_stats(values: np.ndarray, window: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Trailing rolling mean and sample std over `window` values, skipping NaN
+        (same results as `rolling(window, min_periods=1)`), from cumulative sums.
+        """
+        valid = ~np.isnan(values)
+        filled = np.where(valid, values, 0.0)
+        
+        def window_sum(x: np.ndarray) -> np.ndarray:
+            cs = np.concatenate(([0.0], np.cumsum(x)))
+            return cs[1:] - cs[np.maximum(np.arange(1, len(x) + 1) - window, 0)]
+        
+        count = window_sum(valid.astype(np.float64))
+        total = window_sum(filled)
+        total_sq = window_sum(filled * filled)
+        
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.where(count >= 1, total / count, np.nan)
+            var = (total_sq - total * mean) / (count - 1)
+            std = np.where(count >= 2, np.sqrt(np.maximum(var, 0.0)), np.nan)
+        
+        return mean, std
+    
     def train_model(self, df: pd.DataFrame, pollutant: str, model_type: str = 'xgboost') -> Dict:
         """Train forecasting model for specific pollutant"""
         print(f"Training {model_type} model for {pollutant}...")
@@ -78,12 +126,81 @@ class ForecastingEngine:
         # Prepare features
         df_features = self.prepare_features(df)
         
-        # Define feature columns (exclude target and metadata)
-        exclude_cols = ['timestamp', 'value', 'pollutant_type', 'source', 'city', 'location']
-        self.feature_columns = [col for col in df_features.columns if col not in exclude_cols]
+        model, feature_columns, metrics = self._fit_model(df_features, model_type)
+        self._store_model(pollutant, model_type, model, feature_columns, metrics)
+        
+        return metrics
+    
+    def train_all(self, data_by_pollutant: Dict[str, pd.DataFrame], model_type: str = 'xgboost',
+                  n_jobs: Optional[int] = None) -> Tuple[Dict[str, Dict], Dict[str, Exception]]:
+        """
+        Train one model per pollutant in parallel worker processes.
+        
+        `data_by_pollutant` maps each pollutant to its raw readings; features
+        are built once per pollutant before dispatch. Each worker fits with an
+        equal share of the cores so the models do not oversubscribe the
+        machine. A pollutant that fails (e.g. too few readings) does not stop
+        the others.
+        
+        Returns:
+            Tuple of (metrics per trained pollutant, error per failed pollutant)
+        """
+        all_metrics, errors = {}, {}
+        if not data_by_pollutant:
+            return all_metrics, errors
+        
+        cpu_count = os.cpu_count() or 1
+        n_jobs = min(n_jobs or len(data_by_pollutant), len(data_by_pollutant), cpu_count)
+        threads_per_model = max(1, cpu_count // n_jobs)
+        print(f"Training {model_type} models for {len(data_by_pollutant)} pollutants "
+              f"({n_jobs} workers x {threads_per_model} threads)...")
+        
+        pollutants, jobs = [], []
+        for pollutant, data in data_by_pollutant.items():
+            try:
+                df_features = self.prepare_features(data)
+            except Exception as e:
+                errors[pollutant] = e
+                continue
+            pollutants.append(pollutant)
+            jobs.append(delayed(self._try_fit_model)(df_features, model_type, threads_per_model))
+        
+        results = Parallel(n_jobs=n_jobs, backend='loky')(jobs) if jobs else []
+        
+        for pollutant, result in zip(pollutants, results):
+            if isinstance(result, Exception):
+                errors[pollutant] = result
+                continue
+            model, feature_columns, metrics = result
+            self._store_model(pollutant, model_type, model, feature_columns, metrics)
+            all_metrics[pollutant] = metrics
+        
+        for pollutant, error in errors.items():
+            print(f"Could not train model for {pollutant}: {error}")
+        
+        return all_metrics, errors
+    
+    @staticmethod
+    def _try_fit_model(df_features: pd.DataFrame, model_type: str, n_jobs: int = -1):
+        """_fit_model for parallel batches: returns the error instead of raising it"""
+        try:
+            return ForecastingEngine._fit_model(df_features, model_type, n_jobs)
+        except Exception as e:
+            return e
+    
+    @staticmethod
+    def _fit_model(df_features: pd.DataFrame, model_type: str, n_jobs: int = -1) -> Tuple[object, List[str], Dict]:
+        """Fit and evaluate one model; returns (model, feature columns, metrics)"""
+        # Define feature columns: numeric only, excluding the target and
+        # fields derived from it (AQI is computed from the same reading)
+        exclude_cols = ['value', 'aqi', 'aqi_category', 'reported_aqi']
+        feature_columns = [
+            col for col in df_features.select_dtypes(include=[np.number, 'bool']).columns
+            if col not in exclude_cols
+        ]
         
         # Prepare X and y
-        X = df_features[self.feature_columns].fillna(0)
+        X = df_features[feature_columns].fillna(0)
         y = df_features['value']
         
         # Split data (time-series split - no shuffle)
@@ -98,14 +215,14 @@ class ForecastingEngine:
                 max_depth=6,
                 learning_rate=0.1,
                 random_state=42,
-                n_jobs=-1
+                n_jobs=n_jobs
             )
         elif model_type == 'random_forest':
             model = RandomForestRegressor(
                 n_estimators=100,
                 max_depth=10,
                 random_state=42,
-                n_jobs=-1
+                n_jobs=n_jobs
             )
         elif model_type == 'gradient_boosting':
             model = GradientBoostingRegressor(
@@ -128,6 +245,10 @@ class ForecastingEngine:
             'mape': np.mean(np.abs((y_test - y_pred) / y_test)) * 100
         }
         
+        return model, feature_columns, metrics
+    
+    def _store_model(self, pollutant: str, model_type: str, model, feature_columns: List[str], metrics: Dict):
+        """Report metrics, then keep the model for forecasting and save it"""
         print(f"Model Performance for {pollutant}:")
         print(f"  R² Score: {metrics['r2_score']:.4f}")
         print(f"  RMSE: {metrics['rmse']:.4f}")
@@ -135,86 +256,181 @@ class ForecastingEngine:
         print(f"  MAPE: {metrics['mape']:.2f}%")
         
         # Store model
-        self.models[pollutant] = model
+        self.feature_columns = feature_columns
+        self.model_features[pollutant] = feature_columns
+        self.models[pollutant] = self._for_inference(model)
+        self._forecast_cache.clear()
         
         # Save model
         model_path = self.model_dir / f"{pollutant}_{model_type}.joblib"
         joblib.dump({'model': model, 'features': self.feature_columns}, model_path)
         print(f"Model saved to {model_path}")
-        
-        return metrics
     
     def load_model(self, pollutant: str, model_type: str = 'xgboost'):
         """Load trained model from disk"""
         model_path = self.model_dir / f"{pollutant}_{model_type}.joblib"
         if model_path.exists():
             data = joblib.load(model_path)
-            self.models[pollutant] = data['model']
+            self.models[pollutant] = self._for_inference(data['model'])
+            self._forecast_cache.clear()
             self.feature_columns = data['features']
+            self.model_features[pollutant] = data['features']
             print(f"Loaded model for {pollutant} from {model_path}")
             return True
         return False
     
+    @staticmethod
+    def _for_inference(model):
+        """
+        Configure a trained model for forecasting. Recursive forecasts score a
+        handful of rows per call, where spinning up an OpenMP team costs more
+        than walking the trees, so XGBoost predicts single-threaded.
+        """
+        if isinstance(model, XGBRegressor):
+            model.get_booster().set_param({'nthread': 1})
+        return model
+    
     def predict(self, df: pd.DataFrame, pollutant: str, hours: int = 24) -> List[Dict]:
         """Generate forecasts for specified hours ahead"""
         if pollutant not in self.models:
             print(f"No model found for {pollutant}")
             return []
         
-        model = self.models[pollutant]
         df_features = self.prepare_features(df)
+        if df_features.empty:
+            return []
+        
+        last_timestamps, predictions = self._rollout(pollutant, df_features.iloc[[-1]], hours)
+        return self._forecast_records(pollutant, last_timestamps[0], predictions[0])
+    
+    def _rollout(
+        self,
+        pollutant: str,
+        last_rows: pd.DataFrame,
+        hours: int
+    ) -> Tuple[pd.Series, np.ndarray]:
+        """
+        Recursive forecast for one or more series at once.
+        
+        Each row of `last_rows` is the latest feature row of one series; every
+        hour is a single predict call over all rows. Returns the rows' last
+        timestamps and a (rows, hours) matrix of predictions.
+        """
+        model = self.models[pollutant]
+        columns = self.model_features.get(pollutant, self.feature_columns)
+        column_index = {name: i for i, name in enumerate(columns)}
+        # Missing features are filled as in training
+        features = last_rows.reindex(columns=columns).fillna(0).to_numpy(dtype=np.float32)
+        
+        last_timestamps = pd.to_datetime(last_rows['timestamp']).reset_index(drop=True)
+        last_hours = last_timestamps.dt.hour.to_numpy()
         
-        # Get the last known values
-        last_row = df_features.iloc[-1]
-        last_timestamp = pd.to_datetime(last_row['timestamp'])
+        # Positions updated between steps, resolved once
+        hour_idx = column_index.get('hour')
+        hour_sin_idx = column_index.get('hour_sin')
+        hour_cos_idx = column_index.get('hour_cos')
+        lag1_idx = column_index.get('lag_1')
+        lag_shifts = [
+            (column_index[f'lag_{lag}'], column_index[f'lag_{lag-1}'])
+            for lag in range(24, 1, -1)
+            if f'lag_{lag}' in column_index and f'lag_{lag-1}' in column_index
+        ]
         
-        forecasts = []
-        current_features = last_row[self.feature_columns].to_dict()
+        # XGBoost models are called through the booster, skipping the sklearn wrapper
+        booster = model.get_booster() if isinstance(model, XGBRegressor) else None
         
+        predictions = np.empty((len(features), hours), dtype=np.float64)
         for hour in range(1, hours + 1):
-            # Predict next hour
-            X_pred = pd.DataFrame([current_features])
-            prediction = model.predict(X_pred)[0]
+            # Predict next hour for every series
+            if booster is not None:
+                step = booster.inplace_predict(features)
+            else:
+                step = model.predict(pd.DataFrame(features, columns=columns))
+            predictions[:, hour - 1] = step
             
-            # Create forecast record
-            forecast_time = last_timestamp + timedelta(hours=hour)
-            forecast = {
-                'timestamp': forecast_time.isoformat(),
+            # Update features for next iteration
+            forecast_hours = (last_hours + hour) % 24
+            if hour_idx is not None:
+                features[:, hour_idx] = forecast_hours
+            if hour_sin_idx is not None:
+                features[:, hour_sin_idx] = HOUR_SIN[forecast_hours]
+            if hour_cos_idx is not None:
+                features[:, hour_cos_idx] = HOUR_COS[forecast_hours]
+            
+            # Update lag features
+            if lag1_idx is not None:
+                for dst, src in lag_shifts:
+                    features[:, dst] = features[:, src]
+                features[:, lag1_idx] = step
+        
+        return last_timestamps, predictions
+    
+    @staticmethod
+    def _forecast_records(pollutant: str, last_timestamp: pd.Timestamp, predictions: np.ndarray) -> List[Dict]:
+        """Forecast records for consecutive hours after `last_timestamp`"""
+        return [
+            {
+                'timestamp': (last_timestamp + timedelta(hours=hour)).isoformat(),
                 'pollutant_type': pollutant,
                 'predicted_value': float(prediction),
                 'forecast_hour': hour,
                 'confidence': 'medium'  # Simplified confidence
             }
-            forecasts.append(forecast)
-            
-            # Update features for next iteration
-            current_features['hour'] = forecast_time.hour
-            current_features['hour_sin'] = np.sin(2 * np.pi * forecast_time.hour / 24)
-            current_features['hour_cos'] = np.cos(2 * np.pi * forecast_time.hour / 24)
-            
-            # Update lag features
-            if 'lag_1' in current_features:
-                for lag in range(24, 1, -1):
-                    if f'lag_{lag}' in current_features and f'lag_{lag-1}' in current_features:
-                        current_features[f'lag_{lag}'] = current_features[f'lag_{lag-1}']
-                current_features['lag_1'] = prediction
-        
-        return forecasts
+            for hour, prediction in enumerate(predictions, start=1)
+        ]
     
     def forecast_for_location(self, lat: float, lon: float, pollutant: str, hours: int = 24,
                             historical_data: pd.DataFrame = None) -> List[Dict]:
         """Generate forecast for specific location"""
-        if historical_data is None or historical_data.empty:
-            return []
+        return self.forecast_for_locations([(lat, lon)], pollutant, hours, historical_data)[0]
+    
+    def forecast_for_locations(self, locations: List[Tuple[float, float]], pollutant: str,
+                               hours: int = 24, historical_data: pd.DataFrame = None) -> List[List[Dict]]:
+        """
+        Generate forecasts for several (lat, lon) locations with one batched
+        model call per hour. Returns one forecast list per location, empty
+        where there is no nearby data.
+        """
+        forecasts = [[] for _ in locations]
+        if pollutant not in self.models or historical_data is None or historical_data.empty:
+            return forecasts
         
-        # Filter data for location (within 0.1 degree radius)
-        location_data = historical_data[
-            (abs(historical_data['lat'] - lat) < 0.1) &
-            (abs(historical_data['lon'] - lon) < 0.1) &
-            (historical_data['pollutant_type'] == pollutant)
-        ].copy()
+        pollutant_data = historical_data[historical_data['pollutant_type'] == pollutant]
         
-        if location_data.empty:
-            return []
+        # Latest feature row per location (data within 0.1 degree)
+        positions, cache_keys, last_rows = [], [], []
+        for position, (lat, lon) in enumerate(locations):
+            location_data = pollutant_data[
+                (abs(pollutant_data['lat'] - lat) < 0.1) &
+                (abs(pollutant_data['lon'] - lon) < 0.1)
+            ]
+            if location_data.empty:
+                continue
+            
+            # Unchanged data near the same ~1 km cell gives the same forecast
+            cache_key = (
+                pollutant, round(lat, 2), round(lon, 2), hours,
+                pd.to_datetime(location_data['timestamp']).max(), len(location_data)
+            )
+            cached = self._forecast_cache.get(cache_key)
+            if cached is not None:
+                forecasts[position] = [dict(record) for record in cached]
+                continue
+            
+            df_features = self.prepare_features(location_data)
+            if df_features.empty:
+                continue
+            positions.append(position)
+            cache_keys.append(cache_key)
+            last_rows.append(df_features.iloc[[-1]])
         
-        return self.predict(location_data, pollutant, hours)
+        if not last_rows:
+            return forecasts
+        
+        last_timestamps, predictions = self._rollout(pollutant, pd.concat(last_rows), hours)
+        for row, (position, cache_key) in enumerate(zip(positions, cache_keys)):
+            records = self._forecast_records(pollutant, last_timestamps[row], predictions[row])
+            self._forecast_cache[cache_key] = records
+            forecasts[position] = [dict(record) for record in records]
+        
+        return forecasts
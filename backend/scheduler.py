@@ -1,7 +1,8 @@
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.interval import IntervalTrigger
 from apscheduler.triggers.cron import CronTrigger
-from datetime import datetime
+from datetime import datetime, timedelta
+import asyncio
 import logging
 from typing import Optional
 
@@ -13,6 +14,7 @@ from data_processing.validator import DataValidator
 from ml.forecasting_engine import ForecastingEngine
 from services.email_service import EmailService
 from config import settings
+from database import Database, to_bson_dates
 
 logger = logging.getLogger(__name__)
 
@@ -23,6 +25,9 @@ class DataScheduler:
     Runs background jobs at configured intervals.
     """
     
+    # Concurrent per-city ground sensor requests
+    GROUND_FETCH_CONCURRENCY = 5
+    
     def __init__(
         self,
         tempo_client: TEMPOClient,
@@ -133,12 +138,22 @@ class DataScheduler:
         """Initial data fetch on startup"""
         logger.info("Running initial data fetch...")
         try:
-            await self.fetch_ground_data()
-            await self.fetch_weather_data()
+            await asyncio.gather(
+                self.fetch_ground_data(),
+                self.fetch_weather_data()
+            )
             # TEMPO data may not be immediately available
             # await self.fetch_tempo_data()
         except Exception as e:
-            logger.error(f"Error in model retraining: {e}")
+            logger.error(f"Error in initial data fetch: {e}")
+    
+    async def collect_all_data(self):
+        """Fetch TEMPO, ground and weather data concurrently"""
+        await asyncio.gather(
+            self.fetch_tempo_data(),
+            self.fetch_ground_data(),
+            self.fetch_weather_data()
+        )
     
     async def send_daily_aqi_alerts(self):
         """Send daily AQI alerts to all active subscribers"""
@@ -189,6 +204,7 @@ class DataScheduler:
                     # Get forecast data
                     forecast_data = await self.db.forecasts.find_one(
                         {"city": location["city"]},
+                        {"_id": 0, "aqi": 1},
                         sort=[("timestamp", -1)]
                     )
                     
@@ -265,21 +281,25 @@ class DataScheduler:
         """Fetch TEMPO satellite data"""
         logger.info("Fetching TEMPO satellite data...")
         try:
-            pollutants = ["NO2", "O3", "HCHO"]
+            tempo_by_pollutant = await self.tempo_client.fetch_all_tempo()
             
-            for pollutant in pollutants:
-                data = await self.tempo_client.fetch_tempo_data(pollutant=pollutant)
-                
-                if data:
-                    # Save raw data
-                    await self.tempo_client.save_raw_data(data)
-                    
-                    # Store in database
-                    await self.db.raw_tempo.insert_many(data)
-                    
-                    logger.info(f"Stored {len(data)} TEMPO {pollutant} records")
-                else:
+            async def store(pollutant: str, data):
+                if data.empty:
                     logger.warning(f"No TEMPO data retrieved for {pollutant}")
+                    return
+                
+                # Save raw data
+                await self.tempo_client.save_raw_data(data)
+                
+                # Store in database
+                await Database.bulk_insert("raw_tempo", to_bson_dates(data.to_dict("records")))
+                
+                logger.info(f"Stored {len(data)} TEMPO {pollutant} records")
+            
+            # Each pollutant writes its own file and batch, so persist them concurrently
+            await asyncio.gather(
+                *(store(pollutant, data) for pollutant, data in tempo_by_pollutant.items())
+            )
             
         except Exception as e:
             logger.error(f"Error fetching TEMPO data: {e}")
@@ -295,18 +315,31 @@ class DataScheduler:
                 "Dallas", "San Jose", "Austin", "Jacksonville"
             ]
             
-            all_data = []
+            # Fan out per city, bounded to stay within provider rate limits
+            semaphore = asyncio.Semaphore(self.GROUND_FETCH_CONCURRENCY)
             
-            for city in cities:
-                data = await self.ground_client.fetch_all_ground_data(city=city)
-                all_data.extend(data)
+            async def fetch_city(city: str):
+                async with semaphore:
+                    return await self.ground_client.fetch_all_ground_data(city=city)
+            
+            results = await asyncio.gather(
+                *(fetch_city(city) for city in cities),
+                return_exceptions=True
+            )
+            
+            all_data = []
+            for city, result in zip(cities, results):
+                if isinstance(result, Exception):
+                    logger.warning(f"Ground data fetch failed for {city}: {result}")
+                else:
+                    all_data.extend(result)
             
             if all_data:
                 # Save raw data
                 await self.ground_client.save_raw_data(all_data)
                 
                 # Store in database
-                await self.db.raw_ground.insert_many(all_data)
+                await Database.bulk_insert("raw_ground", to_bson_dates(all_data))
                 
                 logger.info(f"Stored {len(all_data)} ground sensor records")
             else:
@@ -340,7 +373,7 @@ class DataScheduler:
                 await self.weather_client.save_raw_data(data)
                 
                 # Store in database
-                await self.db.raw_weather.insert_many(data)
+                await Database.bulk_insert("raw_weather", to_bson_dates(data))
                 
                 logger.info(f"Stored {len(data)} weather records")
             else:
@@ -354,7 +387,7 @@ class DataScheduler:
         logger.info("Harmonizing and validating data...")
         try:
             # Fetch recent raw data from last 2 hours
-            recent_time = datetime.utcnow().isoformat()
+            recent_time = datetime.utcnow() - timedelta(hours=2)
             
             # Get raw data
             tempo_cursor = self.db.raw_tempo.find({
@@ -381,8 +414,9 @@ class DataScheduler:
             
             if harmonized:
                 # Store harmonized data
-                await self.db.harmonized_data.insert_many(harmonized)
-                logger.info(f"Stored {len(harmonized)} harmonized records")
+                inserted = await Database.bulk_insert("harmonized_data", harmonized)
+                await Database.mark_refreshed("harmonized_data")
+                logger.info(f"Stored {inserted} harmonized records")
                 
                 # Validate TEMPO vs ground
                 if tempo_data and ground_data:
@@ -392,7 +426,7 @@ class DataScheduler:
                     )
                     
                     if validation_results:
-                        await self.db.validation_results.insert_many(validation_results)
+                        await Database.bulk_insert("validation_results", validation_results)
                         logger.info(f"Stored {len(validation_results)} validation results")
             
         except Exception as e:
@@ -429,7 +463,14 @@ class DataScheduler:
                     
                     # Add metadata
                     for forecast in forecasts:
-                        forecast["generated_at"] = datetime.utcnow().isoformat()
+                        forecast["generated_at"] = datetime.utcnow()
+                        if isinstance(forecast.get("city"), str):
+                            forecast["city_lower"] = forecast["city"].lower()
+                        if forecast.get("lat") is not None and forecast.get("lon") is not None:
+                            forecast["location"] = {
+                                "type": "Point",
+                                "coordinates": [forecast["lon"], forecast["lat"]]
+                            }
                     
                     all_forecasts.extend(forecasts)
                     logger.info(f"Generated {len(forecasts)} forecasts for {pollutant}")
@@ -439,7 +480,7 @@ class DataScheduler:
             
             if all_forecasts:
                 # Store forecasts
-                await self.db.forecasts.insert_many(all_forecasts)
+                await Database.bulk_insert("forecasts", to_bson_dates(all_forecasts))
                 logger.info(f"Stored {len(all_forecasts)} total forecasts")
             
         except Exception as e:
@@ -457,32 +498,35 @@ class DataScheduler:
                 logger.warning("Insufficient data for model training")
                 return
             
-            # Prepare features
+            # Split raw records by pollutant; features are built during training
             import pandas as pd
-            features = self.forecasting_engine.prepare_features(training_data)
-            
-            # Train models for each pollutant
+            df = pd.DataFrame(training_data)
             pollutants = ["PM2.5", "PM10", "O3", "NO2"]
+            data_by_pollutant = {
+                pollutant: group
+                for pollutant, group in df.groupby("pollutant_type")
+                if pollutant in pollutants
+            }
             
-            for pollutant in pollutants:
-                try:
-                    metrics = self.forecasting_engine.train_model(
-                        features,
-                        pollutant,
-                        model_type="xgboost"
-                    )
-                    
-                    logger.info(f"Trained model for {pollutant}: {metrics}")
-                    
-                    # Store training metrics
-                    await self.db.model_metrics.insert_one({
-                        "timestamp": datetime.utcnow().isoformat(),
-                        "pollutant": pollutant,
-                        "metrics": metrics
-                    })
-                    
-                except Exception as e:
-                    logger.warning(f"Could not train model for {pollutant}: {e}")
+            # Train models for all pollutants in parallel, off the event loop
+            all_metrics, errors = await asyncio.to_thread(
+                self.forecasting_engine.train_all,
+                data_by_pollutant,
+                model_type="xgboost"
+            )
+            
+            for pollutant, metrics in all_metrics.items():
+                logger.info(f"Trained model for {pollutant}: {metrics}")
+            for pollutant, error in errors.items():
+                logger.warning(f"Could not train model for {pollutant}: {error}")
+            
+            # Store training metrics
+            if all_metrics:
+                now = datetime.utcnow()
+                await self.db.model_metrics.insert_many([
+                    {"timestamp": now, "pollutant": pollutant, "metrics": metrics}
+                    for pollutant, metrics in all_metrics.items()
+                ])
             
         except Exception as e:
             logger.error(f"Error retraining models: {e}")
@@ -0,0 +1,78 @@
+"""
+Backfill Script: aqi / aqi_category
+Computes the stored AQI fields server-side for harmonized readings written
+before AQI was calculated at ingestion time.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from pymongo import MongoClient
+from config import settings
+from data_processing.harmonizer import DataHarmonizer
+
+MISSING = {"aqi_category": {"$exists": False}}
+
+
+def aqi_expression(breakpoints) -> dict:
+    """$switch over the EPA bands of one pollutant, matching calculate_aqi_fast"""
+    concentration = {"$max": ["$value", 0]}
+    branches = [
+        {
+            "case": {"$lte": [concentration, c_high]},
+            "then": {
+                "$add": [
+                    {"$multiply": [
+                        (i_high - i_low) / (c_high - c_low),
+                        {"$subtract": [concentration, c_low]}
+                    ]},
+                    i_low
+                ]
+            }
+        }
+        for c_low, c_high, i_low, i_high in breakpoints.tolist()
+    ]
+    return {"$switch": {"branches": branches, "default": 500}}
+
+
+def backfill_aqi():
+    """Set aqi/aqi_category wherever they are missing"""
+    client = MongoClient(settings.mongodb_uri)
+    db = client.get_default_database()
+    collection = db.harmonized_data
+    
+    # Provider-published AQI on ground readings moves to reported_aqi
+    result = collection.update_many(
+        {**MISSING, "data_type": "ground", "aqi": {"$exists": True}},
+        {"$rename": {"aqi": "reported_aqi"}}
+    )
+    print(f"reported_aqi: renamed on {result.modified_count} documents")
+    
+    categories = list(DataHarmonizer.AQI_CATEGORIES)
+    for pollutant, breakpoints in DataHarmonizer.AQI_BREAKPOINTS.items():
+        result = collection.update_many(
+            {**MISSING, "pollutant_type": pollutant, "value": {"$type": "number", "$ne": float("nan")}},
+            [
+                {"$set": {"_aqi": aqi_expression(breakpoints)}},
+                {"$set": {
+                    "aqi": {"$toInt": {"$round": ["$_aqi", 0]}},
+                    "aqi_category": {"$arrayElemAt": [
+                        categories,
+                        {"$toInt": {"$min": [{"$floor": {"$divide": ["$_aqi", 50]}}, len(categories) - 1]}}
+                    ]}
+                }},
+                {"$unset": "_aqi"}
+            ]
+        )
+        print(f"{pollutant}: updated {result.modified_count} documents")
+    
+    # Unknown pollutants and missing values
+    result = collection.update_many(MISSING, {"$set": {"aqi": None, "aqi_category": "Unknown"}})
+    print(f"Unknown: updated {result.modified_count} documents")
+    
+    client.close()
+    print("✅ AQI backfill complete")
+
+if __name__ == "__main__":
+    backfill_aqi()
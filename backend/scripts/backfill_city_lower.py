@@ -0,0 +1,35 @@
+"""
+Backfill Script: city_lower
+Adds the lowercased `city_lower` field used for indexed city lookups to
+documents written before it was stored at ingestion time.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from pymongo import MongoClient
+from config import settings
+
+COLLECTIONS = ["harmonized_data", "forecasts"]
+
+
+def backfill_city_lower():
+    """Set city_lower = lower(city) wherever it is missing"""
+    client = MongoClient(settings.mongodb_uri)
+    db = client.get_default_database()
+    
+    for name in COLLECTIONS:
+        result = db[name].update_many(
+            {"city": {"$type": "string"}, "city_lower": {"$exists": False}},
+            [{"$set": {"city_lower": {"$toLower": "$city"}}}]
+        )
+        print(f"{name}: updated {result.modified_count} documents")
+        
+        db[name].create_index([("city_lower", 1), ("timestamp", -1)])
+    
+    client.close()
+    print("✅ city_lower backfill complete")
+
+if __name__ == "__main__":
+    backfill_city_lower()
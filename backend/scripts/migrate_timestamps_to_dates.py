@@ -0,0 +1,47 @@
+"""
+Migration Script: ISO-string timestamps to BSON dates
+Converts `timestamp` / `generated_at` fields stored as strings into native
+dates so range queries and TTL indexes work on them.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from pymongo import MongoClient
+from config import settings
+
+FIELDS_BY_COLLECTION = {
+    "raw_tempo": ["timestamp"],
+    "raw_ground": ["timestamp"],
+    "raw_weather": ["timestamp"],
+    "harmonized_data": ["timestamp"],
+    "validation_results": ["timestamp"],
+    "forecasts": ["timestamp", "generated_at"],
+    "model_metrics": ["timestamp"],
+    "citizen_reports": ["timestamp"],
+}
+
+
+def migrate_timestamps():
+    """Convert string timestamp fields to dates, leaving unparseable values as-is"""
+    client = MongoClient(settings.mongodb_uri)
+    db = client.get_default_database()
+    
+    for name, fields in FIELDS_BY_COLLECTION.items():
+        for field in fields:
+            result = db[name].update_many(
+                {field: {"$type": "string"}},
+                [{"$set": {field: {"$convert": {
+                    "input": f"${field}",
+                    "to": "date",
+                    "onError": f"${field}"
+                }}}}]
+            )
+            print(f"{name}.{field}: converted {result.modified_count} documents")
+    
+    client.close()
+    print("✅ Timestamp migration complete")
+
+if __name__ == "__main__":
+    migrate_timestamps()
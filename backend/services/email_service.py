@@ -1,5 +1,5 @@
-import smtplib
 import ssl
+import aiosmtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.image import MIMEImage
@@ -18,6 +18,21 @@ class EmailService:
         self.sender_email = os.getenv('SENDER_EMAIL', 'alerts@cleanairsight.com')
         self.sender_password = os.getenv('SENDER_PASSWORD', '')
         
+    async def _send(self, message: MIMEMultipart, recipient: str):
+        """Deliver a message over STARTTLS without blocking the event loop"""
+        await aiosmtplib.send(
+            message,
+            sender=self.sender_email,
+            recipients=[recipient],
+            hostname=self.smtp_server,
+            port=self.smtp_port,
+            start_tls=True,
+            tls_context=ssl.create_default_context(),
+            # Only authenticate if password is provided
+            username=self.sender_email if self.sender_password else None,
+            password=self.sender_password or None
+        )
+        
     def get_aqi_color(self, aqi: int) -> str:
         """Get color based on AQI level"""
         if aqi <= 50:
@@ -177,13 +192,7 @@ class EmailService:
             message.attach(html_part)
             
             # Send email
-            context = ssl.create_default_context()
-            with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
-                server.starttls(context=context)
-                if self.sender_password:  # Only authenticate if password is provided
-                    server.login(self.sender_email, self.sender_password)
-                
-                server.sendmail(self.sender_email, subscriber_email, message.as_string())
+            await self._send(message, subscriber_email)
             
             logger.info(f"Successfully sent AQI alert to {subscriber_email}")
             return True
@@ -251,13 +260,7 @@ class EmailService:
             message.attach(html_part)
             
             # Send email
-            context = ssl.create_default_context()
-            with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
-                server.starttls(context=context)
-                if self.sender_password:
-                    server.login(self.sender_email, self.sender_password)
-                
-                server.sendmail(self.sender_email, subscriber_email, message.as_string())
+            await self._send(message, subscriber_email)
             
             logger.info(f"Successfully sent confirmation email to {subscriber_email}")
             return True
@@ -0,0 +1,194 @@
+import asyncio
+import functools
+import hashlib
+import logging
+import time
+from email.utils import formatdate
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+import orjson
+from cachetools import TTLCache
+from fastapi import Response
+from redis import asyncio as aioredis
+from redis.exceptions import RedisError
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseCache:
+    """
+    Two-level (in-process + Redis) cache for JSON API responses.
+
+    Handlers decorated with `cached` are keyed by their namespace and call
+    arguments; hits are returned as pre-serialized JSON without running the
+    handler. The hottest keys are served from a small local TTL cache before
+    Redis is consulted, and concurrent misses on one key share a single
+    in-flight computation.
+    If Redis is unavailable, only the local layer is used.
+
+    Cached responses carry a weak ETag of their body, a Last-Modified of when
+    the body was generated and, when `max_age` is given, a public
+    Cache-Control header so browsers and CDNs can reuse them.
+    """
+
+    KEY_PREFIX = "cache"
+
+    def __init__(self, local_maxsize: int = 512, local_ttl: int = 15):
+        self.redis: Optional[aioredis.Redis] = None
+        self._local: TTLCache = TTLCache(maxsize=local_maxsize, ttl=local_ttl)
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    async def connect(self, url: str):
+        """Connect to Redis; leaves the cache disabled on failure"""
+        try:
+            client = aioredis.from_url(url)
+            await client.ping()
+            self.redis = client
+            logger.info("Response cache connected to Redis")
+        except (RedisError, OSError) as e:
+            logger.warning(f"Redis unavailable, response caching disabled: {e}")
+            self.redis = None
+
+    async def close(self):
+        """Close the Redis connection"""
+        if self.redis is not None:
+            await self.redis.aclose()
+            self.redis = None
+
+    def _key(self, namespace: str, params: dict) -> str:
+        """Cache key from namespace and normalized call arguments"""
+        signature = orjson.dumps(sorted(params.items()), default=str)
+        return f"{self.KEY_PREFIX}:{namespace}:{hashlib.sha256(signature).hexdigest()}"
+
+    def cached(
+        self,
+        namespace: str,
+        ttl: int,
+        max_age: Optional[int] = None,
+        normalize: Optional[Callable[[dict], dict]] = None
+    ) -> Callable:
+        """
+        Cache an async handler returning JSON-serializable data or a
+        rendered JSON Response for `ttl` seconds; clients may reuse it
+        for `max_age` seconds.
+
+        `normalize` maps the call arguments to canonical values before they
+        are keyed and passed to the handler, so near-identical requests
+        share one entry.
+        """
+        def decorator(handler: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Response]]:
+            @functools.wraps(handler)
+            async def wrapper(**kwargs) -> Response:
+                if normalize is not None:
+                    kwargs = normalize(kwargs)
+                key = self._key(namespace, kwargs)
+
+                entry = self._local.get(key)
+                if entry is not None:
+                    return self._response(entry, "HIT", max_age)
+
+                # Single-flight: concurrent misses on a key share one computation,
+                # run as its own task so no single client's cancellation stops it
+                task = self._inflight.get(key)
+                if task is None:
+                    task = asyncio.ensure_future(self._load(key, ttl, max_age, handler, kwargs))
+                    self._inflight[key] = task
+                    task.add_done_callback(lambda _: self._inflight.pop(key, None))
+                return await asyncio.shield(task)
+
+            return wrapper
+        return decorator
+
+    async def _load(
+        self,
+        key: str,
+        ttl: int,
+        max_age: Optional[int],
+        handler: Callable[..., Awaitable[Any]],
+        kwargs: dict
+    ) -> Response:
+        """Serve a local miss from Redis, or run the handler and store its body"""
+        entry = await self._get(key)
+        if entry is not None:
+            self._local[key] = entry
+            return self._response(entry, "HIT", max_age)
+
+        # Taken before the handler reads any data, so Last-Modified never
+        # claims more freshness than the body has
+        generated_at = int(time.time())
+        result = await handler(**kwargs)
+        if isinstance(result, Response):
+            # Handler already rendered its body; only cache successes
+            if result.status_code != 200:
+                return result
+            body = result.body
+        else:
+            body = orjson.dumps(result, default=str, option=orjson.OPT_SERIALIZE_NUMPY)
+        entry = (generated_at, body)
+        self._local[key] = entry
+        await self._set(key, entry, ttl)
+        return self._response(entry, "MISS", max_age)
+
+    async def invalidate(self, namespace: Optional[str] = None):
+        """Drop cached responses for one namespace, or all of them"""
+        local_prefix = f"{self.KEY_PREFIX}:{namespace}:" if namespace else f"{self.KEY_PREFIX}:"
+        for key in [key for key in self._local if key.startswith(local_prefix)]:
+            self._local.pop(key, None)
+
+        if self.redis is None:
+            return
+
+        pattern = f"{self.KEY_PREFIX}:{namespace}:*" if namespace else f"{self.KEY_PREFIX}:*"
+        try:
+            keys = [key async for key in self.redis.scan_iter(match=pattern, count=500)]
+            if keys:
+                await self.redis.delete(*keys)
+        except RedisError as e:
+            logger.warning(f"Error invalidating response cache: {e}")
+
+    async def _get(self, key: str) -> Optional[Tuple[int, bytes]]:
+        if self.redis is None:
+            return None
+        try:
+            value = await self.redis.get(key)
+        except RedisError as e:
+            logger.warning(f"Response cache read failed: {e}")
+            return None
+        if value is None:
+            return None
+
+        # Stored as b"<generated_at>\n<body>"; anything else is treated as a miss
+        generated_at, _, body = value.partition(b"\n")
+        if not generated_at.isdigit():
+            return None
+        return int(generated_at), body
+
+    async def _set(self, key: str, entry: Tuple[int, bytes], ttl: int):
+        if self.redis is None:
+            return
+        generated_at, body = entry
+        try:
+            await self.redis.set(key, b"%d\n" % generated_at + body, ex=ttl)
+        except RedisError as e:
+            logger.warning(f"Response cache write failed: {e}")
+
+    @staticmethod
+    def etag(body: bytes) -> str:
+        """Weak ETag derived from a response body"""
+        return f'W/"{hashlib.blake2b(body, digest_size=8).hexdigest()}"'
+
+    @classmethod
+    def _response(cls, entry: Tuple[int, bytes], status: str, max_age: Optional[int] = None) -> Response:
+        generated_at, body = entry
+        headers = {
+            "X-Cache": status,
+            "ETag": cls.etag(body),
+            "Last-Modified": formatdate(generated_at, usegmt=True)
+        }
+        if max_age is not None:
+            headers["Cache-Control"] = f"public, max-age={max_age}"
+        return Response(
+            content=body,
+            media_type="application/json",
+            headers=headers
+        )
@@ -0,0 +1,85 @@
+"""
+ARQ worker for on-demand ingestion jobs.
+
+Run alongside the API with:
+    arq worker.WorkerSettings
+
+Jobs are enqueued through Redis by /api/trigger-update, so a collection runs
+once regardless of how many API worker processes received the trigger.
+"""
+
+import logging
+
+from arq.connections import RedisSettings
+
+from config import settings
+from database import db
+from data_ingestion.tempo_client import TEMPOClient
+from data_ingestion.ground_client import GroundSensorClient
+from data_ingestion.weather_client import WeatherClient
+from scheduler import DataScheduler
+from services.response_cache import ResponseCache
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+async def startup(ctx):
+    """Open the database, ingestion clients and response cache once per worker"""
+    await db.connect_db()
+
+    ctx["scheduler"] = DataScheduler(
+        tempo_client=TEMPOClient(
+            settings.nasa_earthdata_username,
+            settings.nasa_earthdata_password
+        ),
+        ground_client=GroundSensorClient(
+            settings.openaq_api_key,
+            settings.airnow_api_key
+        ),
+        weather_client=WeatherClient(settings.openweather_api_key),
+        db=db.get_db()
+    )
+
+    ctx["response_cache"] = ResponseCache()
+    await ctx["response_cache"].connect(settings.redis_url)
+
+
+async def shutdown(ctx):
+    """Release pooled connections"""
+    scheduler = ctx.get("scheduler")
+    if scheduler:
+        await scheduler.tempo_client.close()
+        await scheduler.ground_client.close()
+        await scheduler.weather_client.close()
+
+    if ctx.get("response_cache"):
+        await ctx["response_cache"].close()
+
+    await db.close_db()
+
+
+async def run_data_collection(ctx):
+    """Collect all sources, harmonize, and drop stale cached responses"""
+    logger.info("Starting queued data collection...")
+
+    scheduler = ctx["scheduler"]
+    await scheduler.collect_all_data()
+    await scheduler.harmonize_and_validate()
+
+    await ctx["response_cache"].invalidate()
+
+    logger.info("Queued data collection completed")
+
+
+class WorkerSettings:
+    functions = [run_data_collection]
+    on_startup = startup
+    on_shutdown = shutdown
+    redis_settings = RedisSettings.from_dsn(settings.redis_url)
+    # Ingestion can take several minutes across all sources
+    job_timeout = 1800
+    max_jobs = 1